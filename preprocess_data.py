@@ -1,136 +1,175 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import argparse
+import functools
+import threading
+from src import trade_matrices, trade_sci_join
+from src.trade_sci_join import join_trade_sci
+from src.trade_matrices import trade_totals, pair_matrix
+from src.pipeline import Stage, Pipeline
+
+COUNTRY_NAMES = os.path.join('data', 'country_names.csv')
+TRADE = os.path.join('data', 'trade.csv')
+SCI = os.path.join('data', 'SCI.csv')
+TRADE_SCI_MERGED = os.path.join('data', 'trade_sci_merged.csv')
+COUNTRY_TRADE_TOTALS = os.path.join('data', 'country_trade_totals.csv')
+TRADE_MATRIX_FULL = os.path.join('data', 'trade_matrix_full.csv')
+TRADE_MATRIX_TOP50 = os.path.join('data', 'trade_matrix_top50.csv')
+SCI_MATRIX_FULL = os.path.join('data', 'sci_matrix_full.csv')
+SCI_MATRIX_TOP50 = os.path.join('data', 'sci_matrix_top50.csv')
+
+
+def load_once(func):
+    """Cache a loader's result and run it at most once, even when concurrent stages call it."""
+    cached = functools.lru_cache(maxsize=None)(func)
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper():
+        with lock:
+            return cached()
+    return wrapper
+
+
+@load_once
+def load_country_names():
+    try:
+        country_names_df = pd.read_csv(COUNTRY_NAMES)
+        country_code_to_name = dict(zip(country_names_df['Code'], country_names_df['Name']))
+        print(f"Loaded {len(country_code_to_name)} country mappings")
+        return country_code_to_name
+    except Exception as e:
+        print(f"Error loading country names CSV: {e}")
+        return {}
 
-print("Starting data preprocessing...")
-print("Loading country names mapping...")
-try:
-    country_names_df = pd.read_csv(os.path.join('data', 'country_names.csv'))
-    country_code_to_name = dict(zip(country_names_df['Code'], country_names_df['Name']))
-    print(f"Loaded {len(country_code_to_name)} country mappings")
-except Exception as e:
-    print(f"Error loading country names CSV: {e}")
-    country_code_to_name = {}
 
 def get_country_name(code):
     if not code or pd.isna(code):
         return "Unknown"
     code = code.upper()
+    country_code_to_name = load_country_names()
     if code in country_code_to_name:
         return country_code_to_name[code]
     return code
 
-try:
+
+@load_once
+def load_trade():
     print("Loading trade data...")
-    trade_df = pd.read_csv(os.path.join('data', 'trade.csv'))
-    trade_df = trade_df.rename(columns={
+    trade_df = pd.read_csv(TRADE)
+    return trade_df.rename(columns={
         'iso2_o': 'source',
         'iso2_d': 'target',
         'export': 'value'
     })
-    print("Adding country names to trade data...")
-    trade_df['source_name'] = trade_df['source'].apply(get_country_name)
-    trade_df['target_name'] = trade_df['target'].apply(get_country_name)
 
+
+@load_once
+def load_sci():
     print("Loading SCI data...")
-    sci_df = pd.read_csv(os.path.join('data', 'SCI.csv'))
+    sci_df = pd.read_csv(SCI)
     sci_df.columns = sci_df.columns.str.strip()
     if 'log_sci' not in sci_df.columns:
-        print("Calculating log_sci...")
         sci_df['log_sci'] = np.log1p(sci_df['scaled_sci'])
-    print("Adding country names to SCI data...")
-    sci_df['user_loc_name'] = sci_df['user_loc'].apply(get_country_name)
-    sci_df['fr_loc_name'] = sci_df['fr_loc'].apply(get_country_name)
-
-    print("Preprocessing scatter plot data...")
-    merged_data = []
-    for _, trade_row in trade_df.iterrows():
-        source = trade_row['source']
-        target = trade_row['target']
-        source_name = trade_row['source_name']
-        target_name = trade_row['target_name']
-        trade_value = trade_row['value']
-        sci_row = sci_df[((sci_df['user_loc'] == source) & (sci_df['fr_loc'] == target)) |
-                          ((sci_df['user_loc'] == target) & (sci_df['fr_loc'] == source))]
-        if not sci_row.empty:
-            sci_value = sci_row['log_sci'].mean()
-            scaled_sci_value = sci_row['scaled_sci'].mean()
-            merged_data.append({
-                'country_pair': f"{source_name} - {target_name}",
-                'source': source,
-                'target': target,
-                'source_name': source_name,
-                'target_name': target_name,
-                'trade_volume': trade_value,
-                'log_trade_volume': np.log1p(trade_value),
-                'sci': scaled_sci_value,
-                'log_sci': sci_value
-            })
-    scatter_df = pd.DataFrame(merged_data)
-
-    print("Preprocessing heatmap data...")
-    country_trade_totals = {}
-    country_names = {}
-    for _, row in trade_df.iterrows():
-        source = row['source']
-        target = row['target']
-        source_name = row['source_name']
-        value = row['value']
-        if source not in country_trade_totals:
-            country_trade_totals[source] = 0
-            country_names[source] = source_name
-        if target not in country_trade_totals:
-            country_trade_totals[target] = 0
-            target_matches = trade_df[trade_df['source'] == target]
-            if len(target_matches) > 0:
-                country_names[target] = target_matches.iloc[0]['source_name']
-            else:
-                country_names[target] = get_country_name(target)
-        country_trade_totals[source] += value
-    top_countries = sorted(country_trade_totals.items(), key=lambda x: x[1], reverse=True)[:50]
-    top_country_codes = [country[0] for country in top_countries]
-    top_country_names = [country_names.get(code, get_country_name(code)) for code in top_country_codes]
-
-    print(f"Creating matrices for {len(top_country_codes)} top countries...")
-    trade_matrix = pd.DataFrame(0.0, index=top_country_codes, columns=top_country_codes, dtype='float64')
-    for _, row in trade_df.iterrows():
-        source = row['source']
-        target = row['target']
-        if source in top_country_codes and target in top_country_codes:
-            trade_matrix.loc[source, target] = float(row['value'])
-
-    sci_matrix = pd.DataFrame(0.0, index=top_country_codes, columns=top_country_codes, dtype='float64')
-    for _, row in sci_df.iterrows():
-        source = row['user_loc']
-        target = row['fr_loc']
-        if source in top_country_codes and target in top_country_codes:
-            sci_matrix.loc[source, target] = float(row['scaled_sci'])
-    name_mapping = {code: name for code, name in zip(top_country_codes, top_country_names)}
-
-    print("Renaming matrix indices to country names...")
-    trade_matrix_named = trade_matrix.rename(index=name_mapping, columns=name_mapping)
-    sci_matrix_named = sci_matrix.rename(index=name_mapping, columns=name_mapping)
-
-    print("Saving processed data...")
-    scatter_df.to_csv(os.path.join('data', 'trade_sci_merged.csv'), index=False)
+    return sci_df
+
+
+def load_country_order():
+    """Country codes and names in total-trade order, as written by the country_trade_totals stage."""
+    country_df = pd.read_csv(COUNTRY_TRADE_TOTALS, keep_default_na=False, na_values=[''])
+    return country_df['country_code'].tolist(), dict(zip(country_df['country_code'], country_df['country']))
+
+
+def build_trade_sci_merged():
+    trade_df = load_trade().copy()
+    trade_df['source_name'] = trade_df['source'].apply(get_country_name)
+    trade_df['target_name'] = trade_df['target'].apply(get_country_name)
+    joined = join_trade_sci(trade_df, load_sci())
+    scatter_df = pd.DataFrame({
+        'country_pair': joined['source_name'] + " - " + joined['target_name'],
+        'source': joined['source'],
+        'target': joined['target'],
+        'source_name': joined['source_name'],
+        'target_name': joined['target_name'],
+        'trade_volume': joined['value'],
+        'log_trade_volume': np.log1p(joined['value']),
+        'sci': joined['sci'],
+        'log_sci': joined['log_sci']
+    })
+    scatter_df.to_csv(TRADE_SCI_MERGED, index=False)
     print(f"Saved trade_sci_merged.csv with {len(scatter_df)} rows")
-    trade_matrix_named.to_csv(os.path.join('data', 'trade_matrix_top50.csv'))
-    print("Saved trade_matrix_top50.csv with country names")
-    sci_matrix_named.to_csv(os.path.join('data', 'sci_matrix_top50.csv'))
-    print("Saved sci_matrix_top50.csv with country names")
 
+
+def build_country_trade_totals():
+    totals = trade_totals(load_trade())
     country_df = pd.DataFrame({
-        'country_code': [k for k, v in country_trade_totals.items()],
-        'country': [country_names.get(k, get_country_name(k)) for k, v in country_trade_totals.items()],
-        'total_trade': [float(v) for k, v in country_trade_totals.items()]
+        'country_code': totals.index,
+        'country': [get_country_name(code) for code in totals.index],
+        'total_trade': totals.to_numpy()
     })
-    country_df = country_df.sort_values('total_trade', ascending=False)
-    country_df.to_csv(os.path.join('data', 'country_trade_totals.csv'), index=False)
-    print("Saved country_trade_totals.csv with country names")
+    country_df.to_csv(COUNTRY_TRADE_TOTALS, index=False)
+    print(f"Saved country_trade_totals.csv with {len(country_df)} countries")
+
+
+def save_matrix(matrix, full_path, top50_path):
+    """Write a code-indexed matrix with country names, in full and as its top-50 slice."""
+    _, country_names = load_country_order()
+    named = matrix.rename(index=country_names, columns=country_names)
+    named.to_csv(full_path)
+    named.iloc[:50, :50].to_csv(top50_path)
+    print(f"Saved {os.path.basename(full_path)} ({len(named)} countries) and {os.path.basename(top50_path)}")
+
+
+def build_trade_matrix():
+    country_codes, _ = load_country_order()
+    matrix = pair_matrix(load_trade(), 'source', 'target', 'value', country_codes)
+    save_matrix(matrix, TRADE_MATRIX_FULL, TRADE_MATRIX_TOP50)
+
+
+def build_sci_matrix():
+    country_codes, _ = load_country_order()
+    matrix = pair_matrix(load_sci(), 'user_loc', 'fr_loc', 'scaled_sci', country_codes)
+    save_matrix(matrix, SCI_MATRIX_FULL, SCI_MATRIX_TOP50)
+
+
+STAGES = [
+    Stage('trade_sci_merged', build_trade_sci_merged,
+          inputs=[TRADE, SCI, COUNTRY_NAMES], outputs=[TRADE_SCI_MERGED],
+          code=[load_trade, load_sci, load_country_names, get_country_name, trade_sci_join]),
+    Stage('country_trade_totals', build_country_trade_totals,
+          inputs=[TRADE, COUNTRY_NAMES], outputs=[COUNTRY_TRADE_TOTALS],
+          code=[load_trade, load_country_names, get_country_name, trade_matrices]),
+    Stage('trade_matrix', build_trade_matrix,
+          inputs=[TRADE, COUNTRY_TRADE_TOTALS], outputs=[TRADE_MATRIX_FULL, TRADE_MATRIX_TOP50],
+          code=[load_trade, load_country_order, save_matrix, trade_matrices]),
+    Stage('sci_matrix', build_sci_matrix,
+          inputs=[SCI, COUNTRY_TRADE_TOTALS], outputs=[SCI_MATRIX_FULL, SCI_MATRIX_TOP50],
+          code=[load_sci, load_country_order, save_matrix, trade_matrices]),
+]
+
 
-    print("Preprocessing complete!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the preprocessed data files that are out of date.")
+    parser.add_argument('stages', nargs='*', help="stages to bring up to date (default all), with their dependencies")
+    parser.add_argument('--dry-run', action='store_true', help="list what would be rebuilt and why, without building")
+    parser.add_argument('--force', action='store_true', help="rebuild even if nothing changed")
+    parser.add_argument('--workers', type=int, default=4, help="stages built concurrently")
+    args = parser.parse_args()
 
-except Exception as e:
-    import traceback
-    print(f"Error during preprocessing: {str(e)}")
-    traceback.print_exc()
\ No newline at end of file
+    pipeline = Pipeline(STAGES)
+    try:
+        if args.dry_run:
+            plan = pipeline.plan(args.stages, args.force)
+            for name, reason in plan.items():
+                print(f"would rebuild {name}: {reason}")
+            print(f"{len(plan)} of {len(pipeline.closure(args.stages or pipeline.stages))} stages out of date")
+        else:
+            rebuilt = pipeline.run(args.stages, args.force, args.workers)
+            print(f"Preprocessing complete! Rebuilt {len(rebuilt)} stages")
+    except Exception as e:
+        import traceback
+        print(f"Error during preprocessing: {str(e)}")
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+
+def atomic_write(path, write, binary=False):
+    """Create or replace ``path`` all at once: ``write(f)`` fills a private temp file that is then renamed.
+
+    The temp file is unique per writer, so concurrent threads or processes writing the same
+    path never share one, and readers only ever see a complete file. The parent directory is
+    created if needed.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('wb' if binary else 'w', dir=directory, prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        tmp = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(tmp)
+            raise
+    os.replace(tmp, path)
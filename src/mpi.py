@@ -6,6 +6,7 @@ import pandas as pd
 import random
 random.seed(786)
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 import random
 import pandas as pd
@@ -14,12 +15,269 @@ import time
 from gspread.utils import rowcol_to_a1, a1_to_rowcol
 from oauth2client.service_account import ServiceAccountCredentials
 import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
 import streamlit as st
+from src.sci_snapshot import load_sci_snapshot
+from src.mpi_store import get_result_store
+from src.mpi_models import ThresholdModel, get_model, run_model
+
+
+def sci_edges(df, countries, mode, lo, hi):
+    """Integer (row, col) ids and min-max scaled SCI for every off-diagonal pair in ``df``."""
+    index = {c: i for i, c in enumerate(countries)}
+    rows = df['user_loc'].map(index)
+    cols = df['fr_loc'].map(index)
+    known = rows.notna() & cols.notna() & (rows != cols)
+    vals = ((df.loc[known, mode] - lo) / (hi - lo)).to_numpy(dtype=np.float32)
+    return rows[known].to_numpy(dtype=np.int64), cols[known].to_numpy(dtype=np.int64), vals
+
+
+def normalized_sci_matrix(df, countries, mode, lo, hi):
+    """Dense float32 matrix W[i, j] = min-max scaled SCI of (countries[i], countries[j])."""
+    rows, cols, vals = sci_edges(df, countries, mode, lo, hi)
+    W = np.zeros((len(countries), len(countries)), dtype=np.float32)
+    W[rows, cols] = vals
+    return W
+
+
+def sparse_sci_matrix(df, countries, mode, lo, hi, sci_floor=0.0, top_k=None):
+    """CSR version of :func:`normalized_sci_matrix` that never materializes the dense n x n table.
+
+    Edges whose normalized SCI is below ``sci_floor`` are dropped, and ``top_k`` keeps only the
+    k strongest neighbours each node listens to.
+    """
+    rows, cols, vals = sci_edges(df, countries, mode, lo, hi)
+    keep = (vals > 0) & (vals >= sci_floor)
+    rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    if top_k is not None:
+        order = np.lexsort((-vals, rows))
+        rows, cols, vals = rows[order], cols[order], vals[order]
+        group_start = np.searchsorted(rows, rows, side='left')
+        keep = np.arange(len(rows)) - group_start < top_k
+        rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    n = len(countries)
+    return sparse.csr_matrix((vals, (rows, cols)), shape=(n, n), dtype=np.float32)
+
+
+def initial_counts(n, seed_index, at, replicates=None, dtype=np.int64):
+    """Pass counters before the first step: only the seed country starts at the threshold."""
+    counts = np.zeros(n if replicates is None else (replicates, n), dtype=dtype)
+    if seed_index is not None:
+        counts[..., seed_index] = at
+    return counts
+
+
+def run_loop(W, seed_index, ts, pp, at, rng=random):
+    """Reference engine: the original per-pair Python loop over a normalized SCI matrix."""
+    n = len(W)
+    act = [0] * n
+    if seed_index is not None:
+        act[seed_index] = at
+    results = []
+    for _ in range(ts):
+        new_act = act.copy()
+        for i in range(n):
+            if act[i] >= at:
+                continue
+            for j in range(n):
+                if i == j or act[j] < at:
+                    continue
+                if rng.random() <= pp:
+                    if rng.random() <= W[i][j]:
+                        new_act[i] += 1
+        act = new_act
+        results.append([min(100 * a / at, 100) for a in act])
+    return np.array(results, dtype=np.float32)
+
+
+def run_vectorized(W, seed_index, ts, pp, at, rng, counts=None):
+    """Vectorized engine: one batched Bernoulli draw per (inactive, active) pair per timestep.
+
+    A pass needs both the ``pp`` and the SCI draw to succeed, so each pair fires with
+    probability ``pp * W[i, j]``, exactly as in :func:`run_loop`. Like every resumable engine,
+    it continues from ``counts`` (updated in place) when one is given.
+    """
+    P = (pp * W).astype(np.float32)
+    if counts is None:
+        counts = initial_counts(len(W), seed_index, at)
+    results = np.empty((ts, len(W)), dtype=np.float32)
+    for t in range(ts):
+        active = counts >= at
+        rows = np.flatnonzero(~active)
+        cols = np.flatnonzero(active)
+        if rows.size and cols.size:
+            block = P[np.ix_(rows, cols)]
+            counts[rows] += (rng.random(block.shape, dtype=np.float32) < block).sum(axis=1)
+        results[t] = np.minimum(100 * counts / at, 100)
+    return results
+
+
+def run_sparse(S, seed_index, ts, pp, at, rng, counts=None):
+    """Sparse engine: the vectorized rule restricted to the stored edges of a CSR matrix.
+
+    Each step is a masked sparse matrix-vector product of the active indicator, sampled edge
+    by edge: while few countries are active, the CSC columns of the active senders are drawn;
+    once most are active, the CSR rows of the remaining listeners are drawn instead.
+    """
+    n = S.shape[0]
+    rows_csr = (pp * S).astype(np.float32).tocsr()
+    cols_csc = rows_csr.tocsc()
+    if counts is None:
+        counts = initial_counts(n, seed_index, at)
+    results = np.empty((ts, n), dtype=np.float32)
+    for t in range(ts):
+        active = counts >= at
+        n_active = int(active.sum())
+        if 0 < n_active < n:
+            if 2 * n_active <= n:
+                block = cols_csc[:, np.flatnonzero(active)]
+                fired = (rng.random(block.nnz, dtype=np.float32) < block.data) & ~active[block.indices]
+                counts += np.bincount(block.indices[fired], minlength=n)
+            else:
+                listeners = np.flatnonzero(~active)
+                block = rows_csr[listeners]
+                fired = (rng.random(block.nnz, dtype=np.float32) < block.data) & active[block.indices]
+                owner = np.repeat(np.arange(len(listeners)), np.diff(block.indptr))
+                counts[listeners] += np.bincount(owner[fired], minlength=len(listeners))
+        results[t] = np.minimum(100 * counts / at, 100)
+    return results
+
+
+def run_frontier(W, seed_index, ts, pp, at, rng, window=None, counts=None, quiet=0):
+    """Event-driven engine that stops once the cascade has settled and pads the remaining frames.
+
+    ``reach[i]`` (the expected hits per step country i receives from the active set) is only
+    updated from the columns of newly activated countries, and only inactive countries with
+    ``reach > 0`` are sampled. The run stops as soon as no such country is left, which is exact:
+    nothing can change afterwards. When ``window`` is set it also stops once no count has changed
+    for ``window`` consecutive steps (``quiet`` carries that streak over from a resumed run); that
+    is an approximation, since countries with ``reach > 0`` may still be hit later. Returns the
+    (ts, country) percentages and the step at which convergence was detected (``None`` if the
+    run used every step).
+    """
+    P = (pp * W).astype(np.float32)
+    n = len(W)
+    if counts is None:
+        counts = initial_counts(n, seed_index, at)
+    active = counts >= at
+    reach = P[:, active].sum(axis=1)
+    results = np.empty((ts, n), dtype=np.float32)
+    for t in range(ts):
+        rows = np.flatnonzero(~active & (reach > 0))
+        if rows.size == 0:
+            results[t:] = np.minimum(100 * counts / at, 100)
+            return results, t
+        block = P[np.ix_(rows, np.flatnonzero(active))]
+        hits = (rng.random(block.shape, dtype=np.float32) < block).sum(axis=1)
+        counts[rows] += hits
+        results[t] = np.minimum(100 * counts / at, 100)
+        frontier = rows[counts[rows] >= at]
+        if frontier.size:
+            active[frontier] = True
+            reach += P[:, frontier].sum(axis=1)
+        quiet = 0 if hits.any() else quiet + 1
+        if window and quiet >= window:
+            results[t + 1:] = results[t]
+            return results, t
+    return results, None
+
+
+def quiet_steps(initial, results):
+    """Trailing steps of ``results`` in which no value changed, counting from the ``initial`` state.
+
+    Hits only ever land on countries below the threshold, so an unchanged frame means no count
+    changed; this recovers :func:`run_frontier`'s ``quiet`` streak from a stored trajectory.
+    """
+    frames = np.vstack([initial[None], results])
+    changed = np.flatnonzero(np.any(frames[1:] != frames[:-1], axis=1))
+    return len(results) - (changed[-1] + 1 if changed.size else 0)
+
+
+def run_expected(W, seed_index, ts, pp, at, counts=None):
+    """Deterministic mean-field engine: propagate expected counts instead of sampling them.
+
+    Every inactive country gains ``sum_j pp * W[i, j]`` expected passes per step from the
+    currently active set, which is one matrix-vector product. Once no inactive country can
+    gain anything the state is fixed and the remaining frames are copied.
+    """
+    P = pp * W
+    if counts is None:
+        counts = initial_counts(W.shape[0], seed_index, at, dtype=np.float64)
+    results = np.empty((ts, W.shape[0]), dtype=np.float32)
+    for t in range(ts):
+        active = counts >= at
+        gain = np.where(active, 0, P @ active.astype(np.float32))
+        counts += gain
+        results[t] = np.minimum(100 * counts / at, 100)
+        if not gain.any():
+            results[t + 1:] = results[t]
+            break
+    return results
+
+
+def run_ensemble(W, seed_index, ts, pp, at, replicates, seed=786, counts=None, rngs=None):
+    """Run ``replicates`` independent realizations at once on a stacked (replicate, country) state.
+
+    Every replicate owns a generator spawned from one ``SeedSequence``, so its trajectory does
+    not depend on how many other replicates are run. Each step draws from whichever side of
+    the (inactive, active) cut is smaller for a replicate (see :func:`src.mpi_models.batched_hits`), which
+    keeps the draws within twice the live pair count without per-pair Python work.
+    Resumes from ``counts`` and ``rngs`` when given. Returns a (ts, replicates, country)
+    float32 array of percentages.
+    """
+    state = None if counts is None else {'counts': counts}
+    return run_model(ThresholdModel(), W, seed_index, ts, pp, at, replicates, seed, state, rngs)
+
+
+def ensemble_summary(results):
+    """Mean, median and 5th/95th percentile over the replicate axis, each shaped (ts, country)."""
+    p5, median, p95 = np.percentile(results, [5, 50, 95], axis=1).astype(np.float32)
+    return {'mean': results.mean(axis=1), 'median': median, 'p5': p5, 'p95': p95}
+
+
+ENGINES = ('vectorized', 'loop', 'sparse', 'frontier', 'expected')
+
+CHECKPOINT_LIMIT = 64
+_CHECKPOINTS = OrderedDict()
+_CHECKPOINT_LOCK = threading.Lock()
+
+
+def get_checkpoint(key):
+    with _CHECKPOINT_LOCK:
+        checkpoint = _CHECKPOINTS.get(key)
+        if checkpoint is not None:
+            _CHECKPOINTS.move_to_end(key)
+        return checkpoint
+
+
+def put_checkpoint(key, checkpoint):
+    """Keep the longest run per key, evicting the least recently used keys beyond the limit."""
+    with _CHECKPOINT_LOCK:
+        existing = _CHECKPOINTS.get(key)
+        if existing is None or existing['ts'] < checkpoint['ts']:
+            _CHECKPOINTS[key] = checkpoint
+        _CHECKPOINTS.move_to_end(key)
+        while len(_CHECKPOINTS) > CHECKPOINT_LIMIT:
+            _CHECKPOINTS.popitem(last=False)
+
+
+def _generator(state):
+    rng = np.random.Generator(np.random.PCG64())
+    rng.bit_generator.state = state
+    return rng
+
 
 class MessagePassing:
-    def __init__(self,mode='log_sci'):
-        url = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vRid61-SbR59I_PjTO3VRYlIWcibSGbe71jVa8EVthBii4uiJS-NvziYfZlyD5BbwV2lPvMRv0Xy8sR/pub?gid=284046834&output=csv'
-        self.df = pd.read_csv(url)
+    def __init__(self,mode='log_sci', engine='vectorized', seed=786, df=None, sci_floor=0.0, top_k=None, window=None, snapshot=None):
+        self.snapshot = None
+        if df is None:
+            df, self.snapshot = load_sci_snapshot(snapshot)
+        elif 'log_sci' not in df.columns:
+            df = df.assign(log_sci=np.log1p(df['scaled_sci']))
+        self.df = df
         self.countries_input = self.df['user_loc'].unique().tolist()
         self.activations = []
 
@@ -30,78 +288,284 @@ class MessagePassing:
         self.max = self.df[self.mode].max()
         self.min = self.df[self.mode].min()
 
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        self.engine = engine
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.sci_floor = sci_floor
+        self.top_k = top_k
+        self.window = window
+        self.converged_at = None
+        self._W = None
+        self._S = None
+        self.stats = {}
+
+    @property
+    def W(self):
+        if self._W is None:
+            self._W = normalized_sci_matrix(self.df, self.countries_input, self.mode, self.min, self.max)
+        return self._W
+
+    @property
+    def S(self):
+        if self._S is None:
+            self._S = sparse_sci_matrix(self.df, self.countries_input, self.mode, self.min, self.max,
+                                        self.sci_floor, self.top_k)
+        return self._S
 
     def get_timestep_activations(self, selected_country, ts, pp, at):
-        countries_input = self.countries_input
-        df = self.df
-        scaled_sci_map = {(row['user_loc'], row['fr_loc']): (row[self.mode] - self.min)/(self.max - self.min) for _, row in df.iterrows()}
-        act_map = {country: 0 for country in countries_input}
-        if selected_country in act_map:
-            act_map[selected_country] = at
-        results = []
-        for _ in range(ts):
-            new_act_map = act_map.copy()
-
-            for c1 in countries_input:
-                if act_map[c1] >= at:
-                    continue
-                for c2 in countries_input:
-                    if c1 == c2 or act_map[c2] < at:
-                        continue
-                    if random.random() <= pp:
-                        scaled_sci = scaled_sci_map.get((c1, c2), 0)
-                        if random.random() <= scaled_sci:
-                            new_act_map[c1] += 1
+        seed_index = self.countries_input.index(selected_country) if selected_country in self.countries_input else None
+        start = time.perf_counter()
+        self.converged_at = None
+        if self.engine == 'loop':
+            self.activations = run_loop(self.W, seed_index, ts, pp, at)
+        else:
+            self.activations, self.converged_at = self._resume(seed_index, selected_country, ts, pp, at)
+        self.stats = {
+            'engine': self.engine,
+            'matrix_bytes': matrix_nbytes(self.S if self.engine == 'sparse' else self.W),
+            'step_ms': 1000 * (time.perf_counter() - start) / max(ts, 1),
+        }
+
+    def _checkpoint_key(self, kind, selected_country, pp, at, *extra):
+        return (self.snapshot['sha256'], kind, self.mode, self.sci_floor, self.top_k, self.window, self.seed,
+                selected_country, float(pp), int(at)) + extra
+
+    def _advance(self, seed_index, ts, pp, at, counts, quiet):
+        if self.engine == 'sparse':
+            return run_sparse(self.S, seed_index, ts, pp, at, self.rng, counts), None
+        if self.engine == 'frontier':
+            return run_frontier(self.W, seed_index, ts, pp, at, self.rng, self.window, counts, quiet)
+        if self.engine == 'expected':
+            return run_expected(self.W, seed_index, ts, pp, at, counts), None
+        return run_vectorized(self.W, seed_index, ts, pp, at, self.rng, counts), None
+
+    def _resume(self, seed_index, selected_country, ts, pp, at):
+        """Serve ``ts`` steps from the longest checkpoint with matching parameters.
+
+        Shorter requests are a slice; longer ones restore the final counts and RNG state and only
+        simulate the missing steps, so the trajectory equals a fresh run of the full length.
+        Only snapshot-backed instances checkpoint, since an explicit ``df`` has no stable key.
+        """
+        key = self._checkpoint_key(self.engine, selected_country, pp, at) if self.snapshot else None
+        checkpoint = get_checkpoint(key) if key else None
+        if checkpoint is not None and checkpoint['ts'] >= ts:
+            converged = checkpoint['converged_at']
+            return checkpoint['results'][:ts], converged if converged is not None and converged < ts else None
+
+        n = len(self.countries_input)
+        start = initial_counts(n, seed_index, at, dtype=np.float64 if self.engine == 'expected' else np.int64)
+        if checkpoint is None:
+            done, prefix, converged, counts, quiet = 0, np.empty((0, n), dtype=np.float32), None, start, 0
+        else:
+            done, prefix, converged = checkpoint['ts'], checkpoint['results'], checkpoint['converged_at']
+            counts = checkpoint['counts'].copy()
+            self.rng.bit_generator.state = checkpoint['rng_state']
+            quiet = quiet_steps(np.minimum(100 * start / at, 100), prefix)
+
+        if converged is not None:
+            tail = np.repeat(prefix[-1:], ts - done, axis=0)
+        else:
+            tail, step = self._advance(seed_index, ts - done, pp, at, counts, quiet)
+            converged = None if step is None else done + step
+        results = np.concatenate([prefix, tail])
+        if key:
+            put_checkpoint(key, {'ts': ts, 'results': results, 'counts': counts,
+                                 'rng_state': self.rng.bit_generator.state, 'converged_at': converged})
+        return results, converged
+
+    def get_ensemble_activations(self, selected_country, ts, pp, at, replicates, seed=786, model=None):
+        """Ensemble bands for ``model`` (the original threshold rule by default), checkpointed like
+        :meth:`_resume` so longer runs continue from the stored state and generators."""
+        model = model or ThresholdModel()
+        seed_index = self.countries_input.index(selected_country) if selected_country in self.countries_input else None
+        key = self._checkpoint_key('ensemble', selected_country, pp, at, replicates, seed, model.key) if self.snapshot else None
+        checkpoint = get_checkpoint(key) if key else None
+        if checkpoint is not None and checkpoint['ts'] >= ts:
+            summary = {band: values[:ts] for band, values in checkpoint['summary'].items()}
+        else:
+            if checkpoint is None:
+                done, prefix, state, rngs = 0, None, None, None
+            else:
+                done, prefix = checkpoint['ts'], checkpoint['summary']
+                state = {name: values.copy() for name, values in checkpoint['state'].items()}
+                rngs = [_generator(rng_state) for rng_state in checkpoint['rng_states']]
+            if rngs is None:
+                rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(replicates)]
+            if state is None:
+                state = model.init(len(self.countries_input), seed_index, at, replicates, rngs)
+            summary = ensemble_summary(run_model(model, self.W, seed_index, ts - done, pp, at, replicates, seed, state, rngs))
+            if prefix is not None:
+                summary = {band: np.concatenate([prefix[band], summary[band]]) for band in summary}
+            if key:
+                put_checkpoint(key, {'ts': ts, 'summary': summary, 'state': state,
+                                     'rng_states': [rng.bit_generator.state for rng in rngs]})
+        self.ensemble = summary
+        self.activations = self.ensemble['mean']
+
+
+def matrix_nbytes(M):
+    """Bytes held by a dense array or by the data/index arrays of a sparse matrix."""
+    if sparse.issparse(M):
+        return M.data.nbytes + M.indices.nbytes + M.indptr.nbytes
+    return M.nbytes
+
 
-            act_map = new_act_map
-            result = [min(100 * act_map[c] / at, 100) for c in countries_input]
-            results.append(result)
+def compare_backends(df, selected_country, ts=256, pp=1., at=100, sci_floor=0.0, top_k=None, seed=786):
+    """Memory footprint and mean step time of the dense and sparse backends on the same table."""
+    rows = []
+    for engine in ('vectorized', 'sparse'):
+        mpi = MessagePassing(engine=engine, seed=seed, df=df, sci_floor=sci_floor, top_k=top_k)
+        start = time.perf_counter()
+        matrix = mpi.S if engine == 'sparse' else mpi.W
+        build_s = time.perf_counter() - start
+        mpi.get_timestep_activations(selected_country, ts, pp, at)
+        rows.append({
+            'backend': 'sparse' if engine == 'sparse' else 'dense',
+            'nodes': len(mpi.countries_input),
+            'edges': matrix.nnz if engine == 'sparse' else int(np.count_nonzero(matrix)),
+            'matrix_mb': mpi.stats['matrix_bytes'] / 2**20,
+            'build_s': build_s,
+            'step_ms': mpi.stats['step_ms'],
+            'final_coverage': float(np.mean(mpi.activations[-1])),
+        })
+    return pd.DataFrame(rows)
 
-        self.activations = results
 
+def quantize_activations(values, at, quantum=1):
+    """Cap at ``at`` as before, then round percentages to multiples of ``quantum`` as uint8."""
+    values = np.minimum(np.asarray(values, dtype=np.float32), at)
+    return (np.rint(values / quantum) * quantum).astype(np.uint8)
+
+
+def first_activation_steps(values):
+    """First timestep at which each country is fully activated, or -1 if it never is, as int16.
+
+    Pass the unquantized percentages: quantized curves are capped at ``at`` and never reach 100
+    when ``at`` is below it.
+    """
+    reached = np.asarray(values) >= 100
+    return np.where(reached.any(axis=0), reached.argmax(axis=0), -1).astype(np.int16)
+
+
+PROGRESS_CHUNK = 16
 
 
 @st.cache_data
-def mpi_get_data(country, at = 100,ts = 256,pp = 1.):
-    mpi = MessagePassing()
-    mpi.get_timestep_activations(country, ts, pp, at)
-    
-    countries = mpi.countries_input
-    time_steps = [i for i in range(ts)]
-    values = mpi.activations
+def mpi_get_data(country, at = 100,ts = 256,pp = 1., engine='vectorized', replicates=1, sci_floor=0.0, top_k=None, window=None, mode='stochastic', model='threshold', recovery=0.1, _progress=None):
+    """Compact simulation result: uint8 (ts, country) activation curves plus optional ensemble bands.
+
+    ``first_active`` holds each country's first fully activated step (-1 if never), taken from
+    the unquantized curves.
 
-    records = []
-    for i, year in enumerate(time_steps):
-        for j, country_code in enumerate(countries):
-            row_dict = {
-                'country': country_code, 
-                'value': min(values[i][j],at),
-                'timestep': year
-            }
-            records.append(row_dict)
+    With ``_progress`` (excluded from the cache key), the run advances in chunks of
+    ``PROGRESS_CHUNK`` steps through the checkpoint store and calls ``_progress(done, ts)`` after
+    each one; the callback may raise to abandon the run.
 
+    Finished results are also kept in the on-disk result store, keyed by the SCI snapshot hash
+    and all parameters, so they survive restarts.
 
-    return pd.DataFrame(records)
+    ``model`` picks a rule from :data:`src.mpi_models.MODELS`. Only the default threshold rule
+    has the single-run engines and the expected mode; other models always run as an ensemble
+    and their values are capped at 100 rather than ``at``.
+    """
+    diffusion = get_model(model, recovery)
+    if model != 'threshold':
+        engine, mode = 'ensemble', 'stochastic'
+    if mode == 'expected':
+        engine, replicates = 'expected', 1
+    cap = at if model == 'threshold' else 100
+    mpi = MessagePassing(engine='vectorized' if engine == 'ensemble' else engine, sci_floor=sci_floor, top_k=top_k, window=window)
+    store = get_result_store()
+    key = store.key(mpi.snapshot['sha256'], country=country, at=int(at), ts=int(ts), pp=float(pp),
+                    engine=engine, replicates=int(replicates), sci_floor=float(sci_floor),
+                    top_k=top_k, window=window, seed=mpi.seed, model=diffusion.key)
+    cached = store.get(key)
+    if cached is not None:
+        if _progress is not None:
+            _progress(ts, ts)
+        return cached
+
+    chunks = range(PROGRESS_CHUNK, ts, PROGRESS_CHUNK) if _progress is not None and engine != 'loop' else []
+    for done in [*chunks, ts]:
+        if replicates > 1 or engine == 'ensemble':
+            mpi.get_ensemble_activations(country, done, pp, at, replicates, model=diffusion)
+        else:
+            mpi.get_timestep_activations(country, done, pp, at)
+        if _progress is not None:
+            _progress(done, ts)
+
+    bands = None
+    if replicates > 1:
+        bands = {band: quantize_activations(mpi.ensemble[band], cap) for band in ('median', 'p5', 'p95')}
+    result = {
+        'countries': list(mpi.countries_input),
+        'values': quantize_activations(mpi.activations, cap),
+        'bands': bands,
+        'converged_at': mpi.converged_at,
+        'first_active': first_activation_steps(mpi.activations),
+    }
+    store.put(key, result)
+    return result
 
 def mpi_select_status():
     pass
 
-def mpi_run_fig(df, at, delta_t, projection_choice):
-    fig = px.choropleth(
-            df,
-            locations="country",
-            locationmode="country names",
-            color="value",
-            color_continuous_scale="Viridis",
-            range_color=(0, at),
-            hover_name="country",
-            animation_frame="timestep",
-            title="Message Passing Choropleth",
-            projection = projection_choice
-        )
+def mpi_run_fig(result, at, delta_t, projection_choice):
+    """Animated choropleth with one frame per timestep at which some quantized value changed.
+
+    Countries, hover names, first-activation steps and the colour axis are sent once in the
+    base trace; each frame only carries the integer ``z`` values (and band ``customdata`` for
+    ensembles). Steps where nothing changed are dropped, and the slider keeps the original
+    timestep labels.
+    """
+    countries = result['countries']
+    values = result['values']
+    bands = result['bands']
+    first_active = result['first_active']
+    steps = np.concatenate(([0], np.flatnonzero(np.any(values[1:] != values[:-1], axis=1)) + 1))
+
+    def frame_trace(t):
+        trace = {'type': 'choropleth', 'z': values[t]}
+        if bands is not None:
+            trace['customdata'] = np.stack([bands[b][t] for b in ('median', 'p5', 'p95')], axis=1)
+        return trace
 
-    fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = delta_t
-    fig.layout.updatemenus[0].buttons[0].args[1]['transition']['duration'] = delta_t
+    hover = "<b>%{location}</b><br>value=%{z}<br>fully active from step %{text}"
+    if bands is not None:
+        hover += "<br>median=%{customdata[0]}<br>p5=%{customdata[1]}<br>p95=%{customdata[2]}"
+    base = go.Choropleth(frame_trace(0), locations=countries, locationmode="country names",
+                         text=[str(step) if step >= 0 else "never" for step in first_active],
+                         coloraxis="coloraxis", hovertemplate=hover + "<extra></extra>")
+    fig = go.Figure(data=[base])
+    # Plain dicts skip per-frame graph_objects construction, which dominates build time.
+    fig.frames = [{'name': str(t), 'data': [frame_trace(t)]} for t in steps]
+    play = {'frame': {'duration': delta_t, 'redraw': True}, 'mode': 'immediate',
+            'fromcurrent': True, 'transition': {'duration': delta_t, 'easing': 'linear'}}
+    pause = {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate',
+             'fromcurrent': True, 'transition': {'duration': 0, 'easing': 'linear'}}
+    fig.update_layout(
+        title="Message Passing Choropleth",
+        coloraxis={'colorscale': "Viridis", 'cmin': 0, 'cmax': at, 'colorbar': {'title': {'text': 'value'}}},
+        geo={'projection': {'type': projection_choice}},
+        updatemenus=[{
+            'type': 'buttons', 'direction': 'left', 'showactive': False,
+            'x': 0.1, 'y': 0, 'xanchor': 'right', 'yanchor': 'top', 'pad': {'r': 10, 't': 70},
+            'buttons': [
+                {'label': '&#9654;', 'method': 'animate', 'args': [None, play]},
+                {'label': '&#9724;', 'method': 'animate', 'args': [[None], pause]},
+            ],
+        }],
+        sliders=[{
+            'active': 0, 'x': 0.1, 'y': 0, 'len': 0.9, 'xanchor': 'left', 'yanchor': 'top', 'pad': {'b': 10, 't': 60},
+            'currentvalue': {'prefix': 'timestep='},
+            'steps': [{'label': str(t), 'method': 'animate',
+                       'args': [[str(t)], {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate',
+                                           'transition': {'duration': 0, 'easing': 'linear'}}]}
+                      for t in steps],
+        }],
+    )
     return fig
 
 def mpi_select_fig(countries_input, projection_choice):
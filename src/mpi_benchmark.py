@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import tracemalloc
+
+import numpy as np
+from scipy import sparse
+
+from src.mpi import run_loop, run_vectorized, run_sparse, run_frontier, run_expected, run_ensemble
+
+BASELINE_PATH = os.path.join('data', 'benchmarks', 'mpi_baseline.json')
+SIZES = (50, 200, 1000, 5000, 10000)
+TS_VALUES = (64, 256)
+PP_VALUES = (0.05, 0.5)
+AT_VALUES = (1, 10)
+LOOP_MAX_NODES = 200
+REPLICATES = 8
+TOLERANCE = 1.0
+MEMORY_TOLERANCE = 0.25
+SLACK_SECONDS = 0.002
+MIN_CASE_SECONDS = 0.5
+MAX_RUNS = 500
+MIN_COMPARE_REPEAT = 3
+PATHS = ('loop', 'vectorized', 'sparse', 'frontier', 'expected', 'ensemble')
+
+
+def synthetic_sci(n, mean_degree=60, seed=0):
+    """Random SCI-like graph: dense (n, n) float32 matrix and its CSR twin, both scaled to [0, 1].
+
+    Node sizes are Pareto distributed and pair weights are lognormal noise on the product of
+    sizes, so a few hubs dominate as in the country data. Each node keeps about ``mean_degree``
+    symmetric links, and weights are log-scaled and min-max normalized like ``log_sci``.
+    """
+    rng = np.random.default_rng(seed)
+    size = rng.pareto(1.5, n) + 1
+    m = min(n * mean_degree // 2, n * (n - 1) // 2)
+    i = rng.integers(0, n, m)
+    j = rng.integers(0, n, m)
+    keep = i != j
+    i, j = i[keep], j[keep]
+    w = np.log1p(size[i] * size[j] * rng.lognormal(0, 1.5, i.size))
+    w = ((w - w.min()) / (w.max() - w.min() or 1)).astype(np.float32)
+    rows, cols, vals = np.concatenate([i, j]), np.concatenate([j, i]), np.concatenate([w, w])
+    S = sparse.csr_matrix((vals, (rows, cols)), shape=(n, n), dtype=np.float32)
+    S.sum_duplicates()
+    S.data = np.minimum(S.data, 1)
+    return S.toarray(), S
+
+
+def _run_path(path, W, S, ts, pp, at, seed):
+    rng = np.random.default_rng(seed)
+    if path == 'loop':
+        return run_loop(W, 0, ts, pp, at, random.Random(seed))
+    if path == 'vectorized':
+        return run_vectorized(W, 0, ts, pp, at, rng)
+    if path == 'sparse':
+        return run_sparse(S, 0, ts, pp, at, rng)
+    if path == 'frontier':
+        return run_frontier(W, 0, ts, pp, at, rng)[0]
+    if path == 'expected':
+        return run_expected(W, 0, ts, pp, at)
+    return run_ensemble(W, 0, ts, pp, at, REPLICATES, seed)
+
+
+def measure(path, W, S, ts, pp, at, repeat=3, seed=0, min_case_seconds=MIN_CASE_SECONDS, max_runs=MAX_RUNS):
+    """Median wall time and the peak traced allocation of one run.
+
+    Runs at least ``repeat`` times and keeps going until ``min_case_seconds`` of runs have been
+    timed (up to ``max_runs``), so millisecond-scale cases such as the 184-country workload get
+    hundreds of samples and a stable median instead of a noisy best-of-3.
+    """
+    times = []
+    while len(times) < repeat or (sum(times) < min_case_seconds and len(times) < max_runs):
+        start = time.perf_counter()
+        _run_path(path, W, S, ts, pp, at, seed + len(times))
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        final = _run_path(path, W, S, ts, pp, at, seed)[-1]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    median = float(np.median(times))
+    return {
+        'seconds': median,
+        'step_ms': 1000 * median / ts,
+        'runs': len(times),
+        'peak_mb': peak / 2**20,
+        'final_coverage': float(np.mean(final >= 100)),
+    }
+
+
+def run_benchmarks(sizes=SIZES, paths=PATHS, ts_values=TS_VALUES, pp_values=PP_VALUES, at_values=AT_VALUES,
+                   repeat=3, loop_max_nodes=LOOP_MAX_NODES, log=print):
+    """Time and memory-profile every path over the (size, ts, pp, at) grid.
+
+    The legacy loop engine is quadratic in Python, so it only runs up to ``loop_max_nodes``.
+    """
+    results = []
+    for n in sizes:
+        W, S = synthetic_sci(n)
+        for path, ts, pp, at in itertools.product(paths, ts_values, pp_values, at_values):
+            if path == 'loop' and n > loop_max_nodes:
+                continue
+            row = {'path': path, 'nodes': n, 'edges': int(S.nnz), 'ts': ts, 'pp': pp, 'at': at}
+            row.update(measure(path, W, S, ts, pp, at, repeat))
+            log(f"{path:>10} n={n:<6} ts={ts:<4} pp={pp:<5} at={at:<4} "
+                f"{row['seconds']:8.3f}s {row['peak_mb']:9.1f}MB")
+            results.append(row)
+        del W, S
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'replicates': REPLICATES,
+        },
+        'results': results,
+    }
+
+
+def _case(row):
+    return row['path'], row['nodes'], row['ts'], row['pp'], row['at']
+
+
+def speed_drift(report, baseline, min_seconds=SLACK_SECONDS):
+    """Median current/baseline time ratio over the cases both runs share: the machine-wide speed change."""
+    reference = {_case(row): row for row in baseline['results']}
+    ratios = [row['seconds'] / reference[_case(row)]['seconds'] for row in report['results']
+              if _case(row) in reference and min(row['seconds'], reference[_case(row)]['seconds']) >= min_seconds]
+    return float(np.median(ratios)) if ratios else 1.0
+
+
+def compare(report, baseline, tolerance=TOLERANCE, slack_seconds=SLACK_SECONDS, memory_tolerance=MEMORY_TOLERANCE):
+    """Cases whose time or peak memory exceeds the baseline by more than the tolerance.
+
+    Times are medians over enough repeats to fill :data:`MIN_CASE_SECONDS` and are divided by
+    :func:`speed_drift`, so a busier or slower machine does not flag every case while one path
+    slowing down still does. Even so, country-scale cases on a shared core vary by up to 1.8x
+    between runs, hence the default of 2x. A time also gets ``slack_seconds`` of absolute
+    headroom, which only matters for millisecond cases: a 1 ms case is flagged past 4 ms, and a
+    20x slowdown of any case is. A drift beyond the tolerance is itself reported (case
+    ``'all'``). Peak memory is deterministic and uses ``memory_tolerance``. Cases missing from
+    the baseline are skipped.
+    """
+    reference = {_case(row): row for row in baseline['results']}
+    drift = speed_drift(report, baseline, slack_seconds)
+    regressions = []
+    if drift > 1 + tolerance:
+        regressions.append({'case': 'all', 'metric': 'seconds', 'baseline': 1.0, 'current': drift, 'ratio': drift})
+    for row in report['results']:
+        base = reference.get(_case(row))
+        if base is None:
+            continue
+        expected_seconds = base['seconds'] * drift
+        if row['seconds'] > (1 + tolerance) * expected_seconds + slack_seconds:
+            regressions.append({'case': _case(row), 'metric': 'seconds', 'baseline': base['seconds'],
+                                'current': row['seconds'], 'ratio': row['seconds'] / expected_seconds})
+        if row['peak_mb'] > (1 + memory_tolerance) * base['peak_mb']:
+            regressions.append({'case': _case(row), 'metric': 'peak_mb', 'baseline': base['peak_mb'],
+                                'current': row['peak_mb'], 'ratio': row['peak_mb'] / base['peak_mb'] if base['peak_mb'] else float('inf')})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmarks for the message-passing simulator.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS))
+    parser.add_argument('--ts', type=int, nargs='+', default=list(TS_VALUES))
+    parser.add_argument('--pp', type=float, nargs='+', default=list(PP_VALUES))
+    parser.add_argument('--at', type=int, nargs='+', default=list(AT_VALUES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed drift-corrected slowdown, e.g. 1.0 for 2x")
+    parser.add_argument('--memory-tolerance', type=float, default=MEMORY_TOLERANCE, help="allowed relative peak-memory growth")
+    parser.add_argument('--slack-seconds', type=float, default=SLACK_SECONDS, help="absolute headroom added to every allowed time")
+    parser.add_argument('--save-baseline', action='store_true', help="overwrite the baseline with this run")
+    args = parser.parse_args()
+    if not args.save_baseline and os.path.exists(args.baseline) and args.repeat < MIN_COMPARE_REPEAT:
+        parser.error(f"--repeat must be at least {MIN_COMPARE_REPEAT} when comparing against the baseline")
+
+    report = run_benchmarks(args.sizes, args.paths, args.ts, args.pp, args.at, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"machine speed drift vs baseline: {speed_drift(report, baseline, args.slack_seconds):.2f}x")
+        regressions = compare(report, baseline, args.tolerance, args.slack_seconds, args.memory_tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['case']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} ({r['ratio']:.2f}x)")
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from src.mpi import MessagePassing, run_ensemble
+from src.mpi_sweep import shared_matrix, shared_matrix_pool
+
+CACHE_DIR = os.path.join('data', 'cache', 'influence')
+COVERAGE_LEVELS = (25, 50, 90)
+
+
+def _source_reach(task):
+    """Coverage curve (percent of countries activated per timestep) from one seed country."""
+    seed_index, ts, pp, at, replicates, seed = task
+    results = run_ensemble(shared_matrix(), seed_index, ts, pp, at, replicates, seed)
+    return seed_index, 100 * (results >= 100).mean(axis=(1, 2))
+
+
+def influence_key(snapshot_sha, ts, pp, at, replicates, seed):
+    params = {'snapshot': snapshot_sha, 'ts': int(ts), 'pp': float(pp), 'at': int(at),
+              'replicates': int(replicates), 'seed': int(seed)}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_influence_index(W, countries, ts=256, pp=1., at=100, replicates=1, seed=786, workers=None):
+    """Seed every country in turn and summarize how fast and how far the cascade spreads.
+
+    Sources run in parallel over a shared-memory copy of ``W``. Times are the first step at
+    which the (replicate-averaged) coverage reaches each level, or NaN if it never does.
+    """
+    tasks = [(k, ts, pp, at, replicates, seed) for k in range(len(countries))]
+    with shared_matrix_pool(W, workers) as pool:
+        curves = dict(pool.map(_source_reach, tasks, chunksize=max(1, len(tasks) // 64)))
+
+    rows = []
+    for k, country in enumerate(countries):
+        curve = curves[k]
+        row = {'country': country}
+        for level in COVERAGE_LEVELS:
+            hit = np.flatnonzero(curve >= level)
+            row[f'steps_to_{level}pct'] = int(hit[0]) if hit.size else np.nan
+        row['final_reach_pct'] = float(curve[-1])
+        rows.append(row)
+    index = pd.DataFrame(rows)
+    return index.sort_values(['final_reach_pct', 'steps_to_50pct'], ascending=[False, True], ignore_index=True)
+
+
+def load_influence_index(ts=256, pp=1., at=100, replicates=1, seed=786, cache_dir=CACHE_DIR, rebuild=False):
+    """Ranking for the current SCI snapshot and parameters, built on first use and cached on disk."""
+    mpi = MessagePassing()
+    key = influence_key(mpi.snapshot['sha256'], ts, pp, at, replicates, seed)
+    path = os.path.join(cache_dir, f"influence_{key}.csv")
+    if os.path.exists(path) and not rebuild:
+        return pd.read_csv(path)
+    index = build_influence_index(mpi.W, mpi.countries_input, ts, pp, at, replicates, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    index.to_csv(path, index=False)
+    return index
+
+
+@st.cache_data(show_spinner=False)
+def mpi_influence_data(ts, pp, at, replicates):
+    return load_influence_index(ts, pp, at, replicates)
+
+
+def display_influence_ranking(ts, pp, at, projection_choice):
+    st.markdown("#### Most Influential Starting Countries")
+    st.markdown("""
+    Every country is used as the starting point once with the current parameters. The table ranks them by how much of the world the message finally reaches and how many steps it takes to cover 25%, 50% and 90% of countries. Click a column header to sort.
+    """)
+    replicates = st.number_input(label="Replicates per Source", value=1, min_value=1, max_value=100, step=1)
+    with st.spinner("Loading influence ranking..."):
+        index = mpi_influence_data(ts, pp, at, replicates)
+
+    metric = st.selectbox(
+        label="Color map by",
+        options=['final_reach_pct'] + [f'steps_to_{level}pct' for level in COVERAGE_LEVELS]
+    )
+    st.dataframe(index, use_container_width=True, hide_index=True)
+    fig = px.choropleth(
+        index,
+        locations='country',
+        locationmode='country names',
+        color=metric,
+        color_continuous_scale='Viridis' if metric == 'final_reach_pct' else 'Viridis_r',
+        hover_name='country',
+        hover_data=[c for c in index.columns if c != 'country'],
+        title="Influence by Starting Country",
+        projection=projection_choice
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the all-sources influence ranking.")
+    parser.add_argument('--ts', type=int, default=256)
+    parser.add_argument('--pp', type=float, default=1.)
+    parser.add_argument('--at', type=int, default=100)
+    parser.add_argument('--replicates', type=int, default=1)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+    print(load_influence_index(args.ts, args.pp, args.at, args.replicates, rebuild=args.rebuild).head(20).to_string())
@@ -0,0 +1,109 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from src.mpi import mpi_get_data
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class SimulationJob:
+    """One simulator run shared by every session that asked for the same parameters."""
+
+    def __init__(self, key, params):
+        self.key = key
+        self.params = params
+        self.done_steps = 0
+        self.total_steps = params.get('ts', 0)
+        self.subscribers = set()
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def report(self, done, total):
+        if self.cancelled.is_set():
+            raise JobCancelled(f"simulation {self.params} was superseded")
+        self.done_steps, self.total_steps = done, total
+
+    @property
+    def fraction(self):
+        return self.done_steps / self.total_steps if self.total_steps else 0.0
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class SimulationJobManager:
+    """Process-wide queue of simulator runs on a worker pool.
+
+    Identical in-flight requests are coalesced into one job. Each session follows at most one
+    job; when it submits different parameters, it stops following the old job, and a job
+    nobody follows any more is cancelled (dequeued, or stopped at its next progress report).
+    A finished job is dropped from every session that followed it: a successful result is
+    already in ``st.cache_data`` and the result store, and a failed one must not be replayed.
+    """
+
+    def __init__(self, workers=None):
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix='mpi-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._sessions = {}
+
+    def submit(self, session_id, **params):
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and current.key == key and not current.done():
+                return current
+            job = self._jobs.get(key)
+            if job is None:
+                job = SimulationJob(key, params)
+                self._jobs[key] = job
+                job.future = self._pool.submit(self._run, job)
+            job.subscribers.add(session_id)
+            self._sessions[session_id] = job
+            if current is not None:
+                self._release(current, session_id)
+        return job
+
+    def forget(self, session_id):
+        """Drop a session's interest in its job, e.g. when it resets the simulator."""
+        with self._lock:
+            job = self._sessions.pop(session_id, None)
+            if job is not None:
+                self._release(job, session_id)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _release(self, job, session_id):
+        job.subscribers.discard(session_id)
+        if not job.subscribers and not job.future.done():
+            job.cancelled.set()
+            job.future.cancel()
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def _run(self, job):
+        try:
+            return mpi_get_data(**job.params, _progress=job.report)
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+                for session_id in job.subscribers:
+                    if self._sessions.get(session_id) is job:
+                        del self._sessions[session_id]
+                job.subscribers.clear()
+
+
+@st.cache_resource
+def get_job_manager():
+    return SimulationJobManager()
@@ -0,0 +1,201 @@
+import numpy as np
+
+
+def batched_hits(P, PT, sources, targets, rngs):
+    """Successful passes per (replicate, country) from ``sources`` to ``targets`` in one step.
+
+    Every (source j, target i) pair fires independently with probability ``P[i, j]``. For each
+    replicate the draws are taken from whichever side is smaller: a row of ``n`` draws per
+    source, masked to targets, or a row per target, masked to sources. ``sources`` and
+    ``targets`` are disjoint (replicate, country) masks and ``PT`` is ``P.T`` in C order.
+    """
+    n = P.shape[1]
+    hits = np.zeros(sources.shape, dtype=np.int64)
+    n_src = sources.sum(axis=1)
+    n_tgt = targets.sum(axis=1)
+    live = (n_src > 0) & (n_tgt > 0)
+    senders = np.flatnonzero(live & (n_src <= n_tgt))
+    listeners = np.flatnonzero(live & (n_src > n_tgt))
+    if senders.size:
+        r, j = np.nonzero(sources[senders])
+        draws = np.concatenate([rngs[k].random((n_src[k], n), dtype=np.float32) for k in senders])
+        fired = (draws < PT[j]) & targets[senders[r]]
+        starts = np.concatenate(([0], np.cumsum(n_src[senders])[:-1]))
+        hits[senders] += np.add.reduceat(fired, starts, axis=0, dtype=np.int64)
+    if listeners.size:
+        r, i = np.nonzero(targets[listeners])
+        draws = np.concatenate([rngs[k].random((n_tgt[k], n), dtype=np.float32) for k in listeners])
+        fired = (draws < P[i]) & sources[listeners[r]]
+        hits[listeners[r], i] += fired.sum(axis=1)
+    return hits
+
+
+class DiffusionModel:
+    """A spreading rule expressed as vectorized updates of a stacked (replicate, country) state.
+
+    Subclasses define ``init``, ``step`` and ``values``; :func:`run_model` drives the time loop.
+    ``key`` identifies the rule and its parameters for caching.
+    """
+    name = None
+    label = None
+
+    def __init__(self, **params):
+        self.params = params
+
+    @property
+    def key(self):
+        return (self.name,) + tuple(sorted(self.params.items()))
+
+    def prepare(self, W, pp):
+        P = (pp * W).astype(np.float32)
+        return {'P': P, 'PT': np.ascontiguousarray(P.T)}
+
+    def init(self, n, seed_index, at, replicates, rngs):
+        raise NotImplementedError
+
+    def step(self, state, mats, at, rngs):
+        raise NotImplementedError
+
+    def values(self, state, at):
+        raise NotImplementedError
+
+
+class ThresholdModel(DiffusionModel):
+    """The original rule: informed neighbours keep passing until ``at`` passes have been received."""
+    name = 'threshold'
+    label = 'Repeated Exposure'
+
+    def init(self, n, seed_index, at, replicates, rngs):
+        counts = np.zeros((replicates, n), dtype=np.int64)
+        if seed_index is not None:
+            counts[:, seed_index] = at
+        return {'counts': counts}
+
+    def step(self, state, mats, at, rngs):
+        active = state['counts'] >= at
+        state['counts'] += batched_hits(mats['P'], mats['PT'], active, ~active, rngs)
+
+    def values(self, state, at):
+        return np.minimum(100 * state['counts'] / at, 100)
+
+
+class IndependentCascadeModel(DiffusionModel):
+    """Each newly informed country gets a single chance to inform each uninformed neighbour."""
+    name = 'independent_cascade'
+    label = 'Independent Cascade'
+
+    def init(self, n, seed_index, at, replicates, rngs):
+        # 0 uninformed, 1 informed this step (still spreading), 2 informed earlier (spent).
+        status = np.zeros((replicates, n), dtype=np.int8)
+        if seed_index is not None:
+            status[:, seed_index] = 1
+        return {'status': status}
+
+    def step(self, state, mats, at, rngs):
+        status = state['status']
+        hits = batched_hits(mats['P'], mats['PT'], status == 1, status == 0, rngs)
+        status[status == 1] = 2
+        status[hits > 0] = 1
+
+    def values(self, state, at):
+        return np.where(state['status'] > 0, 100, 0).astype(np.float32)
+
+
+class LinearThresholdModel(DiffusionModel):
+    """A country is informed once the SCI-weighted share of informed neighbours passes a random threshold.
+
+    Incoming weights are normalized to sum to ``pp``, thresholds are drawn uniformly per country
+    and replicate, and values show progress towards each threshold.
+    """
+    name = 'linear_threshold'
+    label = 'Linear Threshold'
+
+    def prepare(self, W, pp):
+        strength = W.sum(axis=1, keepdims=True)
+        B = pp * np.divide(W, strength, out=np.zeros_like(W), where=strength > 0)
+        return {'BT': np.ascontiguousarray(B.T, dtype=np.float32)}
+
+    def init(self, n, seed_index, at, replicates, rngs):
+        theta = np.stack([rng.random(n, dtype=np.float32) for rng in rngs])
+        active = np.zeros((replicates, n), dtype=bool)
+        if seed_index is not None:
+            active[:, seed_index] = True
+        return {'theta': np.maximum(theta, np.float32(1e-6)), 'active': active,
+                'influence': np.zeros((replicates, n), dtype=np.float32)}
+
+    def step(self, state, mats, at, rngs):
+        state['influence'] = state['active'].astype(np.float32) @ mats['BT']
+        state['active'] |= state['influence'] >= state['theta']
+
+    def values(self, state, at):
+        progress = np.minimum(100 * state['influence'] / state['theta'], 100)
+        return np.where(state['active'], 100, progress).astype(np.float32)
+
+
+class SIRModel(DiffusionModel):
+    """Infected countries transmit each step and recover with probability ``recovery``.
+
+    Values are 0 for susceptible, 100 for infected and 50 for recovered countries.
+    """
+    name = 'sir'
+    label = 'SIR (with recovery)'
+    recovered = 2
+
+    def __init__(self, recovery=0.1):
+        super().__init__(recovery=float(recovery))
+
+    def init(self, n, seed_index, at, replicates, rngs):
+        # 0 susceptible, 1 infected, 2 recovered.
+        status = np.zeros((replicates, n), dtype=np.int8)
+        if seed_index is not None:
+            status[:, seed_index] = 1
+        return {'status': status}
+
+    def step(self, state, mats, at, rngs):
+        status = state['status']
+        infected = status == 1
+        hits = batched_hits(mats['P'], mats['PT'], infected, status == 0, rngs)
+        draws = np.stack([rng.random(status.shape[1], dtype=np.float32) for rng in rngs])
+        status[infected & (draws < self.params['recovery'])] = self.recovered
+        status[hits > 0] = 1
+
+    def values(self, state, at):
+        return np.array([0, 100, 50], dtype=np.float32)[state['status']]
+
+
+class SISModel(SIRModel):
+    """SIR variant in which recovered countries become susceptible again."""
+    name = 'sis'
+    label = 'SIS (reinfection)'
+    recovered = 0
+
+
+MODELS = {model.name: model for model in (ThresholdModel, IndependentCascadeModel, LinearThresholdModel,
+                                          SIRModel, SISModel)}
+
+
+def get_model(name, recovery=0.1):
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}', expected one of {tuple(MODELS)}")
+    if issubclass(MODELS[name], SIRModel):
+        return MODELS[name](recovery)
+    return MODELS[name]()
+
+
+def run_model(model, W, seed_index, ts, pp, at, replicates, seed=786, state=None, rngs=None):
+    """Run ``replicates`` realizations of ``model`` on a stacked (replicate, country) state.
+
+    Every replicate owns a generator spawned from one ``SeedSequence``. ``state`` and ``rngs``
+    are updated in place, so a run can be resumed from them. Returns a (ts, replicates,
+    country) float32 array of values.
+    """
+    if rngs is None:
+        rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(replicates)]
+    if state is None:
+        state = model.init(W.shape[0], seed_index, at, replicates, rngs)
+    mats = model.prepare(W, pp)
+    results = np.empty((ts, replicates, W.shape[0]), dtype=np.float32)
+    for t in range(ts):
+        model.step(state, mats, at, rngs)
+        results[t] = model.values(state, at)
+    return results
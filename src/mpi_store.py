@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+import streamlit as st
+
+from src.atomic_io import atomic_write
+
+STORE_DIR = os.path.join('data', 'cache', 'results')
+DEFAULT_MAX_MB = 256
+BANDS = ('median', 'p5', 'p95')
+
+
+class ResultStore:
+    """Disk-backed store of compact simulator results with a size cap and LRU eviction.
+
+    Each result is one compressed ``.npz`` of uint8 curves and int16 first-activation steps, named by a hash of the SCI snapshot
+    and every simulation parameter. Reads refresh the file's modification time, so eviction
+    removes the least recently used files first. Hit/miss counters cover this process only.
+    """
+
+    def __init__(self, directory=STORE_DIR, max_bytes=DEFAULT_MAX_MB * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(snapshot_sha, **params):
+        payload = json.dumps({'snapshot': snapshot_sha, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {
+                    'countries': data['countries'].tolist(),
+                    'values': data['values'],
+                    'bands': {band: data[band] for band in BANDS} if 'median' in data.files else None,
+                    'converged_at': int(data['converged_at']) if data['converged_at'] >= 0 else None,
+                    'first_active': data['first_active'],
+                }
+            os.utime(path)
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        arrays = {
+            'countries': np.asarray(result['countries'], dtype='U'),
+            'values': result['values'],
+            'converged_at': np.int64(-1 if result['converged_at'] is None else result['converged_at']),
+            'first_active': result['first_active'],
+        }
+        if result['bands'] is not None:
+            arrays.update(result['bands'])
+        atomic_write(self._path(key), lambda f: np.savez_compressed(f, **arrays), binary=True)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+
+@st.cache_resource
+def get_result_store():
+    max_mb = float(os.environ.get('MPI_STORE_MAX_MB', DEFAULT_MAX_MB))
+    return ResultStore(max_bytes=int(max_mb * 2**20))
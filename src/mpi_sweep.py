@@ -0,0 +1,142 @@
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from src.mpi import MessagePassing, run_ensemble
+
+_W = None
+_SHM = None
+
+
+def _attach(name, shape, dtype):
+    """Worker initializer: map the parent's normalized SCI matrix instead of unpickling a copy."""
+    global _W, _SHM
+    _SHM = shared_memory.SharedMemory(name=name)
+    _W = np.ndarray(shape, dtype=dtype, buffer=_SHM.buf)
+
+
+def shared_matrix():
+    """The matrix mapped by :func:`shared_matrix_pool`, for use inside worker tasks."""
+    return _W
+
+
+@contextmanager
+def shared_matrix_pool(W, workers=None):
+    """Process pool whose workers all map one shared-memory copy of ``W``.
+
+    ``workers`` defaults to every available core. The segment is unlinked when the pool exits.
+    """
+    W = np.ascontiguousarray(W, dtype=np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=W.nbytes)
+    try:
+        np.ndarray(W.shape, dtype=W.dtype, buffer=shm.buf)[:] = W
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_attach,
+                                 initargs=(shm.name, W.shape, W.dtype.str)) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _coverage(task):
+    """Final share of activated countries, per replicate, for one (pp, at) grid point."""
+    seed_index, ts, pp, at, replicates, seed = task
+    final = run_ensemble(_W, seed_index, ts, pp, at, replicates, seed)[-1]
+    return pp, at, (final >= 100).mean(axis=1)
+
+
+def sweep_pp(W, seed_index, ts, pp_values, at_values=(100,), replicates=10, workers=None, seed=786):
+    """Final coverage over a grid of ``pp`` (and optionally ``at``) values, one grid point per task.
+
+    The matrix is copied once into shared memory and every worker process maps it read-only,
+    so tasks only carry a few scalars. ``workers`` defaults to every available core. Returns a
+    frame with the mean and 5th/95th percentile coverage (in percent) per grid point.
+    """
+    tasks = [(seed_index, ts, float(pp), int(at), replicates, seed) for at in at_values for pp in pp_values]
+    with shared_matrix_pool(W, min(workers or os.cpu_count() or 1, len(tasks))) as pool:
+        results = list(pool.map(_coverage, tasks))
+
+    rows = []
+    for pp, at, coverage in results:
+        rows.append({
+            'pp': pp,
+            'at': at,
+            'coverage': 100 * coverage.mean(),
+            'coverage_p5': 100 * np.percentile(coverage, 5),
+            'coverage_p95': 100 * np.percentile(coverage, 95),
+        })
+    return pd.DataFrame(rows)
+
+
+def estimate_critical_pp(curve: pd.DataFrame) -> dict:
+    """Critical ``pp`` per activation threshold: the midpoint of the steepest coverage rise.
+
+    Thresholds whose curve never rises inside the grid are left out.
+    """
+    critical = {}
+    for at, group in curve.groupby('at'):
+        group = group.sort_values('pp')
+        pp = group['pp'].to_numpy()
+        coverage = group['coverage'].to_numpy()
+        if len(pp) < 2:
+            continue
+        slope = np.diff(coverage) / np.diff(pp)
+        if slope.max() <= 0:
+            continue
+        k = int(np.argmax(slope))
+        critical[at] = float((pp[k] + pp[k + 1]) / 2)
+    return critical
+
+
+@st.cache_data(show_spinner=False)
+def mpi_sweep_data(country, ts, pp_values, at_values, replicates):
+    mpi = MessagePassing()
+    seed_index = mpi.countries_input.index(country)
+    return sweep_pp(mpi.W, seed_index, ts, pp_values, at_values, replicates)
+
+
+def display_critical_sweep(country, ts, at):
+    st.markdown("#### Critical Passing Probability")
+    st.markdown("""
+    Run the simulator over a grid of passing probabilities from the selected country and plot the share of countries that end up informed. The steepest part of the curve marks the critical value where a trickle becomes a cascade.
+    """)
+    sweep_col1, sweep_col2, sweep_col3 = st.columns(3)
+    with sweep_col1:
+        pp_max = st.number_input(label="Largest Passing Probability", value=1.0, min_value=0.01, max_value=1.0, step=0.01, format="%.2f")
+    with sweep_col2:
+        points = st.number_input(label="Grid Points", value=32, min_value=4, max_value=256, step=1)
+    with sweep_col3:
+        replicates = st.number_input(label="Replicates per Point", value=10, min_value=1, max_value=200, step=1)
+    extra_at = st.text_input(label="Also sweep these Activation Thresholds (comma separated)", value="")
+
+    if not st.button("Run Sweep"):
+        return
+
+    at_values = [at] + [int(v) for v in extra_at.split(',') if v.strip().isdigit() and int(v) != at]
+    pp_values = tuple(np.round(np.linspace(0, pp_max, points), 4).tolist())
+    with st.spinner(f"Running {len(pp_values) * len(at_values)} grid points on {os.cpu_count()} cores..."):
+        curve = mpi_sweep_data(country, ts, pp_values, tuple(at_values), replicates)
+
+    critical = estimate_critical_pp(curve)
+    fig = px.line(
+        curve, x='pp', y='coverage', color=curve['at'].astype(str),
+        markers=True,
+        hover_data=['coverage_p5', 'coverage_p95'],
+        labels={'pp': 'Passing Probability', 'coverage': 'Final Coverage (%)', 'color': 'Activation Threshold'},
+        title=f"Final Coverage vs. Passing Probability from {country}"
+    )
+    for at_value, pp_c in critical.items():
+        fig.add_vline(x=pp_c, line_dash='dash', annotation_text=f"at={at_value}: pp≈{pp_c:.3f}")
+    st.plotly_chart(fig, use_container_width=True)
+    if critical:
+        st.write(", ".join(f"Estimated critical pp for threshold {a}: **{p:.3f}**" for a, p in critical.items()))
+    missing = [a for a in at_values if a not in critical]
+    if missing:
+        st.info(f"No transition found in range for threshold(s) {', '.join(map(str, missing))}; "
+                f"widen the pp range (currently up to {pp_max:.2f}).")
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import inspect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.atomic_io import atomic_write
+
+MANIFEST_PATH = os.path.join('data', 'cache', 'preprocess_manifest.json')
+
+
+def file_sha(path, chunk=1 << 20):
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_version(*objects):
+    """Short hash of the source code of functions or modules, so editing a stage makes it stale."""
+    h = hashlib.sha256()
+    for obj in objects:
+        h.update(inspect.getsource(obj).encode())
+    return h.hexdigest()[:16]
+
+
+class Stage:
+    """A named build step that turns input files into output files.
+
+    ``inputs`` may include outputs of other stages, which makes those stages dependencies.
+    ``code`` lists the functions or modules whose source determines the stage's version.
+    """
+
+    def __init__(self, name, build, inputs, outputs, code=()):
+        self.name = name
+        self.build = build
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.version = code_version(build, *code)
+
+
+class Pipeline:
+    """Builds stages in dependency order, skipping those whose inputs, code and outputs are unchanged.
+
+    Each built stage's input hashes, version and output hashes go into a JSON manifest. A stage is
+    stale when it has no record, its version changed, an input hash changed, or an output is
+    missing or was edited since it was written. Stages whose dependencies are done run
+    concurrently on a thread pool.
+    """
+
+    def __init__(self, stages, manifest_path=MANIFEST_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        self.manifest_path = manifest_path
+        producer = {path: stage.name for stage in stages for path in stage.outputs}
+        self.deps = {stage.name: sorted({producer[p] for p in stage.inputs if p in producer}) for stage in stages}
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        state = {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            state[name] = 'visiting'
+            for dep in self.deps[name]:
+                visit(dep)
+            state[name] = 'done'
+
+        for name in self.stages:
+            visit(name)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        atomic_write(self.manifest_path, lambda f: json.dump(manifest, f, indent=1, sort_keys=True))
+
+    def stale_reason(self, name, record):
+        """Why stage ``name`` must be rebuilt given its manifest ``record``, or None if it is current."""
+        stage = self.stages[name]
+        if record is None:
+            return "never built"
+        if record.get('version') != stage.version:
+            return "code changed"
+        for path in stage.inputs:
+            if record.get('inputs', {}).get(path) != file_sha(path):
+                return f"input changed: {path}"
+        for path in stage.outputs:
+            if record.get('outputs', {}).get(path) != file_sha(path):
+                return f"output missing or modified: {path}"
+        return None
+
+    def closure(self, targets):
+        """``targets`` and everything they depend on."""
+        needed, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage '{name}', expected one of {sorted(self.stages)}")
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.deps[name])
+        return needed
+
+    def plan(self, targets=None, force=False):
+        """What a run would rebuild, as {stage: reason}, without building anything.
+
+        A stage downstream of a rebuilt one is listed too, since its inputs are about to change.
+        """
+        manifest = self.load_manifest()
+        needed = self.closure(targets or self.stages)
+        plan = {}
+
+        def reason(name):
+            if name in plan:
+                return plan[name]
+            upstream = [dep for dep in self.deps[name] if reason(dep)]
+            if force:
+                plan[name] = "forced"
+            elif upstream:
+                plan[name] = f"upstream rebuilt: {', '.join(upstream)}"
+            else:
+                plan[name] = self.stale_reason(name, manifest.get(name))
+            return plan[name]
+
+        for name in needed:
+            reason(name)
+        return {name: plan[name] for name in self.stages if name in needed and plan[name]}
+
+    def _build(self, name):
+        stage = self.stages[name]
+        inputs = {path: file_sha(path) for path in stage.inputs}
+        start = time.perf_counter()
+        stage.build()
+        return {
+            'version': stage.version,
+            'inputs': inputs,
+            'outputs': {path: file_sha(path) for path in stage.outputs},
+            'seconds': round(time.perf_counter() - start, 3),
+            'built': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    def run(self, targets=None, force=False, workers=4, log=print):
+        """Build the stale stages among ``targets`` (default all) and their dependencies.
+
+        Staleness is decided when a stage becomes ready, so a rebuilt dependency whose outputs
+        come out byte-identical does not force its dependents. Returns the names of rebuilt stages.
+        """
+        manifest = self.load_manifest()
+        pending = self.closure(targets or self.stages)
+        done, rebuilt = set(), []
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                for name in sorted(pending):
+                    if not all(dep in done for dep in self.deps[name]):
+                        continue
+                    pending.discard(name)
+                    reason = "forced" if force else self.stale_reason(name, manifest.get(name))
+                    if reason is None:
+                        log(f"[skip]  {name}")
+                        done.add(name)
+                        continue
+                    log(f"[build] {name} ({reason})")
+                    running[pool.submit(self._build, name)] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    manifest[name] = future.result()
+                    self.save_manifest(manifest)
+                    log(f"[done]  {name} in {manifest[name]['seconds']:.2f}s")
+                    done.add(name)
+                    rebuilt.append(name)
+        return rebuilt
@@ -3,9 +3,16 @@ import pandas as pd
 import numpy as np
 import networkx as nx
 import community as community_louvain
-from pyvis.network import Network
-import itertools
+import string
+import heapq
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import eigsh
+from plotly.colors import sample_colorscale
+from src.atomic_io import atomic_write
 
 @st.cache_data(show_spinner=False)
 def load_and_preprocess(path: str) -> pd.DataFrame:
@@ -13,104 +20,486 @@ def load_and_preprocess(path: str) -> pd.DataFrame:
     df['scaled_sci'] = np.log1p(df['scaled_sci'])
     return df.dropna()
 
+def symmetric_edges(df: pd.DataFrame):
+    """Node names plus integer (u, v) ids, summed weight and last ``scaled_sci`` per undirected pair.
+
+    Each row's pair is canonicalized as (min id, max id) and both directions are group-summed
+    in one pass. Nodes and edges keep their order of first appearance in ``df``.
+    """
+    codes, names = pd.factorize(np.column_stack([df['user_loc'], df['fr_loc']]).ravel())
+    codes = codes.reshape(-1, 2)
+    lo, hi = codes.min(axis=1), codes.max(axis=1)
+    pairs = pd.DataFrame({'key': lo * len(names) + hi, 'scaled_sci': df['scaled_sci'].to_numpy()})
+    grouped = pairs.groupby('key', sort=False)['scaled_sci'].agg(['sum', 'last'])
+    key = grouped.index.to_numpy()
+    return np.asarray(names), key // len(names), key % len(names), grouped['sum'].to_numpy(), grouped['last'].to_numpy()
+
 @st.cache_data(show_spinner=False)
 def build_full_graph(df: pd.DataFrame) -> nx.Graph:
-    G = nx.from_pandas_edgelist(
-        df, 'user_loc', 'fr_loc',
-        edge_attr='scaled_sci',
-        create_using=nx.Graph()
+    names, u, v, weight, last = symmetric_edges(df)
+    G = nx.Graph()
+    G.add_nodes_from(names)
+    G.add_edges_from(
+        (a, b, {'scaled_sci': s, 'weight': w})
+        for a, b, s, w in zip(names[u].tolist(), names[v].tolist(), last.tolist(), weight.tolist())
     )
-    for u, v in list(G.edges()):
-        total_w = df.loc[
-            ((df.user_loc == u) & (df.fr_loc == v)) |
-            ((df.user_loc == v) & (df.fr_loc == u)),
-            'scaled_sci'
-        ].sum()
-        G[u][v]['weight'] = total_w
     return G
 
-def top_k_subgraph(G: nx.Graph, k: int) -> nx.Graph:
+def ranked_adjacency(G: nx.Graph) -> dict:
+    """Every node's neighbours as flat arrays, sorted by descending weight within each node.
+
+    ``indptr`` delimits each node's run, as in CSR, so a node's top k neighbours are the first
+    k entries of its run. Ties keep the graph's adjacency order.
+    """
+    names = list(G.nodes())
+    ids = {n: i for i, n in enumerate(names)}
+    rows, cols, weight, scaled = [], [], [], []
+    for n, nbrs in G.adjacency():
+        for v, attr in nbrs.items():
+            rows.append(ids[n])
+            cols.append(ids[v])
+            weight.append(attr['weight'])
+            scaled.append(attr['scaled_sci'])
+    rows, weight = np.asarray(rows, dtype=np.int64), np.asarray(weight, dtype=np.float64)
+    order = np.lexsort((-weight, rows))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(names)))))
+    return {
+        'names': np.asarray(names, dtype=object),
+        'indptr': indptr,
+        'rank': np.arange(len(rows)) - indptr[rows[order]],
+        'rows': rows[order],
+        'cols': np.asarray(cols, dtype=np.int64)[order],
+        'weight': weight[order],
+        'scaled_sci': np.asarray(scaled, dtype=np.float64)[order],
+    }
+
+def top_k_edges(index: dict, k: int):
+    """(row, col) ids and attributes of every node's k strongest edges, as a prefix slice of the index."""
+    keep = index['rank'] < k
+    return index['rows'][keep], index['cols'][keep], index['weight'][keep], index['scaled_sci'][keep]
+
+def top_k_subgraph(G: nx.Graph, k: int, index: dict = None) -> nx.Graph:
+    index = ranked_adjacency(G) if index is None else index
+    rows, cols, weight, scaled = top_k_edges(index, k)
+    names = index['names']
     H = nx.Graph()
     H.add_nodes_from(G.nodes(data=True))
-    for n in G.nodes():
-        nbrs = sorted(
-            G[n].items(),
-            key=lambda x: x[1]['weight'],
-            reverse=True
-        )[:k]
-        for v, attr in nbrs:
-            H.add_edge(n, v, **attr)
+    H.add_edges_from(
+        (u, v, {'scaled_sci': s, 'weight': w})
+        for u, v, s, w in zip(names[rows].tolist(), names[cols].tolist(), scaled.tolist(), weight.tolist())
+    )
     return H
 
-def weighted_k_core(G: nx.Graph, k: float) -> nx.Graph:
-    H = G.copy()
-    while True:
-        low = [n for n, deg in H.degree(weight='weight') if deg < k]
-        if not low:
-            break
-        H.remove_nodes_from(low)
-    return H
+def weighted_core_numbers(G: nx.Graph) -> dict:
+    """Weighted core value of every node: the largest k for which it survives ``weighted_k_core``.
 
-@st.cache_data(show_spinner=False)
-def detect_and_layout(_G: nx.Graph) -> nx.Graph:
+    Nodes are peeled in order of current strength from a heap (stale entries are skipped), and
+    each gets the running maximum of the strengths seen at removal. One pass, O(E log E).
+    Strengths are updated by subtraction, so a threshold exactly equal to a core value can
+    differ from repeated peeling by float rounding.
     """
-    Only detect communities here. Layout will be handled by Vis.js physics.
+    strength = dict(G.degree(weight='weight'))
+    heap = [(s, i, n) for i, (n, s) in enumerate(strength.items())]
+    heapq.heapify(heap)
+    order = {n: i for i, n in enumerate(strength)}
+    cores, level = {}, float('-inf')
+    while heap:
+        s, _, n = heapq.heappop(heap)
+        if n in cores or s != strength[n]:
+            continue
+        level = max(level, s)
+        cores[n] = level
+        for v, attr in G[n].items():
+            if v != n and v not in cores:
+                strength[v] -= attr['weight']
+                heapq.heappush(heap, (strength[v], order[v], v))
+    return cores
+
+def weighted_k_core(G: nx.Graph, k: float, cores: dict = None) -> nx.Graph:
+    cores = weighted_core_numbers(G) if cores is None else cores
+    return G.subgraph([n for n in G if cores[n] >= k]).copy()
+
+COMMUNITY_DIR = os.path.join('data', 'cache', 'communities')
+LOUVAIN_SEED = 786
+
+def graph_fingerprint(G: nx.Graph) -> str:
+    """Short hash of the node list and the (u, v, weight) edge arrays.
+
+    Much cheaper than hashing the pickled graph. Graphs built the same way get the same
+    fingerprint; it is sensitive to node and edge order.
     """
-    G = _G
-    partition = community_louvain.best_partition(G, weight='weight')
+    names = list(G.nodes())
+    ids = {n: i for i, n in enumerate(names)}
+    edges = np.array([(ids[u], ids[v]) for u, v in G.edges()], dtype=np.int64)
+    weights = np.fromiter((w for _, _, w in G.edges(data='weight')), dtype=np.float64, count=len(edges))
+    h = hashlib.sha256('\x1f'.join(map(str, names)).encode())
+    h.update(edges.tobytes())
+    h.update(weights.tobytes())
+    return h.hexdigest()[:16]
+
+def louvain_partition(G: nx.Graph, resolution=1.0, seed=LOUVAIN_SEED, cache_dir=COMMUNITY_DIR, fingerprint=None) -> dict:
+    """Louvain communities of ``G``, stored on disk under the graph fingerprint, resolution and seed."""
+    fingerprint = fingerprint or graph_fingerprint(G)
+    path = os.path.join(cache_dir, f"louvain_{fingerprint}_r{resolution:g}_s{seed}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    partition = community_louvain.best_partition(G, weight='weight', resolution=resolution, random_state=seed)
+    atomic_write(path, lambda f: json.dump(partition, f))
+    return partition
+
+_LOUVAIN_GRAPH = None
+
+def _set_louvain_graph(G, fingerprint):
+    global _LOUVAIN_GRAPH
+    _LOUVAIN_GRAPH = (G, fingerprint)
+
+def _louvain_run(task):
+    resolution, seed = task
+    G, fingerprint = _LOUVAIN_GRAPH
+    partition = louvain_partition(G, resolution, seed, fingerprint=fingerprint)
+    return {
+        'resolution': resolution,
+        'seed': seed,
+        'communities': len(set(partition.values())),
+        'modularity': community_louvain.modularity(partition, G, weight='weight'),
+    }
+
+def louvain_resolution_scan(G: nx.Graph, resolutions, seeds=(LOUVAIN_SEED,), workers=None) -> pd.DataFrame:
+    """Louvain at every (resolution, seed) pair in a process pool, with community count and modularity.
+
+    The graph is sent once per worker, and each partition lands in the same disk cache that
+    :func:`louvain_partition` reads, so picking a resolution afterwards is free.
+    """
+    tasks = [(float(r), int(s)) for r in resolutions for s in seeds]
+    fingerprint = graph_fingerprint(G)
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(tasks)),
+                             initializer=_set_louvain_graph, initargs=(G, fingerprint)) as pool:
+        rows = list(pool.map(_louvain_run, tasks))
+    return pd.DataFrame(rows)
+
+def detect_and_layout(G: nx.Graph, resolution=1.0, seed=LOUVAIN_SEED) -> nx.Graph:
+    """
+    Only detect communities here. Node positions come from :func:`compute_layout`, computed
+    server-side and cached; browser physics is off unless the user turns it on.
+    """
+    partition = louvain_partition(G, resolution, seed)
     nx.set_node_attributes(G, partition, 'community')
     return G
 
-def make_pyvis_html(G: nx.Graph) -> str:
-    """Generate an interactive PyVis HTML with live physics."""
-    net = Network(
-        height='750px',
-        width='100%',
-        directed=False,
-        notebook=False
-    )
-    
-    net.barnes_hut(
-        gravity=-20000,
-        central_gravity=0.3,
-        spring_length=50,
-        spring_strength=0.1,
-        damping=0.9,
-        overlap=0
-    )
+LAYOUT_DIR = os.path.join('data', 'cache', 'layouts')
+LAYOUT_SCALE = 1000
 
-    palette = itertools.cycle([
-        '#e6194b','#3cb44b','#ffe119','#4363d8','#f58231',
-        '#911eb4','#46f0f0','#f032e6','#bcf60c','#fabebe'
-    ])
-    comms = set(nx.get_node_attributes(G, 'community').values())
-    colors = {c: next(palette) for c in comms}
-
-    for node, data in G.nodes(data=True):
-        strength = G.degree(node, weight='weight')
-        net.add_node(
-            node,
-            label=node,
-            font={
-                "size": 50,
-            },
-            title=f"Strength: {strength:.2f}",
-            color=colors[data['community']],
-            size=(5 + np.log1p(strength))
-        )
-
-    for u, v, data in G.edges(data=True):
-        net.add_edge(
-            u, v,
-            value=data['weight'],
-            title=f"Weight: {data['weight']:.2f}"
-        )
-
-    net.show_buttons(filter_=['physics','layout'])
-    return net.generate_html()
+def compute_layout(G: nx.Graph, k: int, fingerprint=None, cache_dir=LAYOUT_DIR, seed=LOUVAIN_SEED) -> dict:
+    """Fixed (x, y) canvas coordinates per node, cached on disk per (graph fingerprint, k).
+
+    Uses networkx's vectorized Fruchterman-Reingold layout with SCI weights as attraction, so
+    the browser can draw the graph without running its own physics simulation.
+    """
+    fingerprint = fingerprint or graph_fingerprint(G)
+    path = os.path.join(cache_dir, f"layout_{fingerprint}_k{k}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    pos = nx.spring_layout(G, weight='weight', seed=seed, scale=LAYOUT_SCALE)
+    layout = {n: [round(float(x), 1), round(float(y), 1)] for n, (x, y) in pos.items()}
+    atomic_write(path, lambda f: json.dump(layout, f))
+    return layout
+
+MAX_TOP_K = 20
+LOD_NODE_LIMIT = 300
+RESOLUTIONS = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0)
+
+@st.cache_resource(show_spinner=False)
+def load_sci_network(path: str) -> dict:
+    """Full graph and its ranked-adjacency index, built once per data file."""
+    G = build_full_graph(load_and_preprocess(path))
+    return {'G': G, 'index': ranked_adjacency(G)}
+
+@st.cache_resource(show_spinner=False, max_entries=4 * MAX_TOP_K)
+def sparse_view(path: str, k: int, resolution: float = 1.0) -> nx.Graph:
+    """Top-k subgraph with Louvain communities, weighted core values and fixed layout
+    coordinates, cached per k so revisiting a slider value is free."""
+    network = load_sci_network(path)
+    G = detect_and_layout(top_k_subgraph(network['G'], k, network['index']), resolution)
+    G.graph['fingerprint'] = graph_fingerprint(G)
+    nx.set_node_attributes(G, weighted_core_numbers(G), 'core')
+    nx.set_node_attributes(G, compute_layout(G, k, G.graph['fingerprint']), 'pos')
+    G.graph['meta'] = community_meta_graph(G)
+    return G
+
+CENTRALITY_DIR = os.path.join('data', 'cache', 'centrality')
+CENTRALITY_METRICS = ('strength', 'pagerank', 'eigenvector', 'betweenness', 'clustering')
+CENTRALITY_VERSION = 2
+
+def centrality_metrics(G: nx.Graph, pivots: int = None, seed=LOUVAIN_SEED) -> pd.DataFrame:
+    """Weighted strength, PageRank, eigenvector centrality, sampled betweenness and clustering per node.
+
+    Top-k graphs are often disconnected, and one leading eigenvector would give every country
+    outside the largest component zero. Eigenvector centrality is therefore computed per
+    connected component with ``eigsh`` and scaled so each component's most central country is
+    1 (components of one or two countries are uniform).
+
+    Clustering is the geometric-mean triangle intensity (Onnela et al., as in
+    ``nx.clustering``) from the diagonal of ``(W^(1/3))^3`` of the sparse weight matrix.
+    Betweenness treats 1 / weight as distance and samples ``pivots`` source countries
+    (all of them when ``None``); more pivots are more accurate and slower.
+    """
+    names = list(G.nodes())
+    A = nx.to_scipy_sparse_array(G, nodelist=names, weight='weight', format='csr')
+    A.setdiag(0)
+    A.eliminate_zeros()
+    strength = dict(G.degree(weight='weight'))
+
+    pagerank = nx.pagerank(G, weight='weight')
+    eigenvector = np.ones(len(names))
+    n_components, component = connected_components(A, directed=False)
+    for c in range(n_components):
+        members = np.flatnonzero(component == c)
+        if len(members) > 2:
+            _, vec = eigsh(A[members][:, members].astype(np.float64), k=1, which='LA')
+            vec = np.abs(vec[:, 0])
+            eigenvector[members] = vec / (vec.max() or 1)
+
+    C = A.astype(np.float64) / (A.max() or 1)
+    C.data = np.cbrt(C.data)
+    triangles = (C @ C @ C).diagonal()
+    degree = np.diff(A.indptr)
+    pairs = degree * (degree - 1)
+    clustering = np.divide(triangles, pairs, out=np.zeros(len(names)), where=pairs > 0)
+
+    pivots = None if pivots is None or pivots >= len(names) else int(pivots)
+    betweenness = nx.betweenness_centrality(G, k=pivots, weight=lambda u, v, d: 1 / d['weight'], seed=seed)
+
+    return pd.DataFrame({
+        'country': names,
+        'strength': [strength[n] for n in names],
+        'pagerank': [pagerank[n] for n in names],
+        'eigenvector': eigenvector,
+        'betweenness': [betweenness[n] for n in names],
+        'clustering': clustering,
+    })
+
+def load_centrality(G: nx.Graph, pivots: int = None, fingerprint=None, cache_dir=CENTRALITY_DIR) -> pd.DataFrame:
+    """:func:`centrality_metrics` cached on disk per (graph fingerprint, betweenness pivots)."""
+    fingerprint = fingerprint or graph_fingerprint(G)
+    pivots = None if pivots is None or pivots >= G.number_of_nodes() else int(pivots)
+    path = os.path.join(cache_dir, f"centrality_v{CENTRALITY_VERSION}_{fingerprint}_p{pivots or 'all'}.csv")
+    if os.path.exists(path):
+        return pd.read_csv(path, keep_default_na=False)
+    metrics = centrality_metrics(G, pivots)
+    atomic_write(path, lambda f: metrics.to_csv(f, index=False))
+    return metrics
+
+PALETTE = ['#e6194b','#3cb44b','#ffe119','#4363d8','#f58231',
+           '#911eb4','#46f0f0','#f032e6','#bcf60c','#fabebe']
+
+_VIS_PAGE = """<html>
+<head>
+<meta charset="utf-8">
+<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/dist/vis-network.min.css" crossorigin="anonymous" referrerpolicy="no-referrer" />
+<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js" crossorigin="anonymous" referrerpolicy="no-referrer"></script>
+<style>#network { width: 100%; height: ${height}px; border: 1px solid lightgray; }</style>
+</head>
+<body>
+<div id="network"></div>
+<script type="text/javascript">
+var g = ${payload};
+"""
+_VIS_PAGE_END = """
+</script>
+</body>
+</html>"""
+
+# Static vis.js pages; only the JSON payload and options are filled in per render.
+NETWORK_TEMPLATE = string.Template(_VIS_PAGE + """
+var nodes = g.n.map(function (d, i) {
+    var node = {id: i, label: d[0], size: d[1], color: g.c[d[2]], title: d[3], font: {size: 50}};
+    if (d.length > 4) { node.x = d[4]; node.y = d[5]; }
+    return node;
+});
+var edges = g.e.map(function (d) {
+    return {from: d[0], to: d[1], value: d[2], title: "Weight: " + d[2].toFixed(2)};
+});
+new vis.Network(document.getElementById("network"),
+                {nodes: new vis.DataSet(nodes), edges: new vis.DataSet(edges)}, ${options});
+""" + _VIS_PAGE_END)
+
+# Level-of-detail page: starts with one node per community and swaps a clicked community for
+# its members (double-click a member to collapse it again). Edges touching expanded
+# communities are re-aggregated in the browser from the full edge list.
+COMMUNITY_TEMPLATE = string.Template(_VIS_PAGE + """
+var expanded = {};
+var nodes = new vis.DataSet(), edges = new vis.DataSet();
+function memberNode(i) {
+    var d = g.n[i];
+    var node = {id: "n" + i, label: d[0], size: d[1], color: g.c[d[2]], title: d[3], font: {size: 50}};
+    if (d.length > 4) { node.x = d[4]; node.y = d[5]; }
+    return node;
+}
+function superNode(c) {
+    var d = g.m[c];
+    return {id: "c" + c, label: d[0], size: d[1], color: g.mc[d[2]], x: d[5], y: d[6], font: {size: 60},
+            title: d[3] + " countries\\nInternal weight: " + d[4].toFixed(2) + "\\nClick to expand"};
+}
+function endpoint(i) { return expanded[g.k[i]] ? "n" + i : "c" + g.k[i]; }
+function edgeRow(a, b, w) { return {from: a, to: b, value: w, title: "Weight: " + w.toFixed(2)}; }
+function render() {
+    var shown = [], links = [], any = false;
+    g.m.forEach(function (d, c) { if (expanded[c]) { any = true; } else { shown.push(superNode(c)); } });
+    g.k.forEach(function (c, i) { if (expanded[c]) { shown.push(memberNode(i)); } });
+    if (!any) {
+        g.me.forEach(function (d) { links.push(edgeRow("c" + d[0], "c" + d[1], d[2])); });
+    } else {
+        var agg = {};
+        g.e.forEach(function (d) {
+            var a = endpoint(d[0]), b = endpoint(d[1]);
+            if (a === b) { return; }
+            var key = a < b ? a + "|" + b : b + "|" + a;
+            agg[key] = (agg[key] || 0) + d[2];
+        });
+        Object.keys(agg).forEach(function (key) {
+            var ends = key.split("|");
+            links.push(edgeRow(ends[0], ends[1], Math.round(agg[key] * 100) / 100));
+        });
+    }
+    nodes.clear(); edges.clear();
+    nodes.add(shown); edges.add(links);
+}
+render();
+var network = new vis.Network(document.getElementById("network"), {nodes: nodes, edges: edges}, ${options});
+network.on("click", function (p) {
+    if (p.nodes.length && String(p.nodes[0]).charAt(0) === "c") { expanded[+p.nodes[0].slice(1)] = true; render(); }
+});
+network.on("doubleClick", function (p) {
+    if (p.nodes.length && String(p.nodes[0]).charAt(0) === "n") { delete expanded[g.k[+p.nodes[0].slice(1)]]; render(); }
+});
+""" + _VIS_PAGE_END)
+
+STATIC_OPTIONS = {
+    'edges': {'color': {'inherit': True}, 'smooth': {'enabled': True, 'type': 'continuous'}},
+    'physics': {'enabled': False},
+}
+PHYSICS_OPTIONS = {
+    'configure': {'enabled': True, 'filter': ['physics', 'layout']},
+    'edges': {'color': {'inherit': True}, 'smooth': {'enabled': True, 'type': 'dynamic'}},
+    'physics': {
+        'enabled': True,
+        'solver': 'barnesHut',
+        'barnesHut': {'gravitationalConstant': -20000, 'centralGravity': 0.3, 'springLength': 50,
+                      'springConstant': 0.1, 'damping': 0.9, 'avoidOverlap': 0},
+    },
+}
+
+def network_payload(G: nx.Graph, metrics: pd.DataFrame = None, size_by='strength', color_by='community') -> dict:
+    """Compact node/edge payload: positional rows, integer node ids and rounded numbers.
+
+    Nodes are ``[label, size, colour index, tooltip, x, y]`` (coordinates only when laid out),
+    edges are ``[from, to, weight]`` and ``c`` holds the colours. With ``metrics`` (a
+    :func:`centrality_metrics` frame), nodes can be sized by any metric and coloured by one on
+    a binned Viridis scale instead of by community, and tooltips list every metric.
+    """
+    ids = {n: i for i, n in enumerate(G.nodes())}
+    strength = dict(G.degree(weight='weight'))
+    metrics = None if metrics is None else metrics.set_index('country').loc[list(G.nodes())]
+    if metrics is not None and size_by != 'strength':
+        values = metrics[size_by].to_numpy(dtype=np.float64)
+        sizes = 5 + 30 * values / (values.max() or 1)
+    else:
+        sizes = 5 + np.log1p([strength[n] for n in G.nodes()])
+    if metrics is not None and color_by != 'community':
+        values = metrics[color_by].to_numpy(dtype=np.float64)
+        span = (values.max() - values.min()) or 1
+        color_index = np.minimum((len(PALETTE) * (values - values.min()) / span).astype(int), len(PALETTE) - 1)
+        colors = sample_colorscale('Viridis', [(i + 0.5) / len(PALETTE) for i in range(len(PALETTE))])
+    else:
+        comms = sorted(set(nx.get_node_attributes(G, 'community').values()))
+        index = {c: i % len(PALETTE) for i, c in enumerate(comms)}
+        color_index = [index[c] for c in nx.get_node_attributes(G, 'community').values()]
+        colors = PALETTE[:max(1, min(len(comms), len(PALETTE)))]
+    nodes = []
+    for i, (node, data) in enumerate(G.nodes(data=True)):
+        if metrics is None:
+            title = f"Strength: {strength[node]:.2f}"
+        else:
+            title = "\n".join(f"{m.title()}: {metrics.at[node, m]:.4g}" for m in CENTRALITY_METRICS)
+        row = [node, round(float(sizes[i]), 2), int(color_index[i]), title]
+        if 'pos' in data:
+            row += data['pos']
+        nodes.append(row)
+    edges = [[ids[u], ids[v], round(w, 2)] for u, v, w in G.edges(data='weight')]
+    return {'n': nodes, 'e': edges, 'c': colors}
+
+def community_meta_graph(G: nx.Graph) -> dict:
+    """Collapse every Louvain community of ``G`` into one supernode.
+
+    All aggregates are group sums over the edge arrays: ``intra`` is the summed weight inside
+    each community, ``edges`` the (a, b, weight) totals between communities, plus member
+    counts, summed strength and, when nodes are laid out, the centroid of member positions.
+    ``node_community`` maps each node (in ``G`` order) to its community index.
+    """
+    names = list(G.nodes())
+    ids = {n: i for i, n in enumerate(names)}
+    labels, node_community = np.unique([G.nodes[n]['community'] for n in names], return_inverse=True)
+    C = len(labels)
+    u = np.fromiter((ids[a] for a, _ in G.edges()), dtype=np.int64, count=G.number_of_edges())
+    v = np.fromiter((ids[b] for _, b in G.edges()), dtype=np.int64, count=G.number_of_edges())
+    w = np.fromiter((x for _, _, x in G.edges(data='weight')), dtype=np.float64, count=G.number_of_edges())
+    a, b = np.minimum(node_community[u], node_community[v]), np.maximum(node_community[u], node_community[v])
+    totals = np.bincount(a * C + b, weights=w, minlength=C * C).reshape(C, C)
+    ea, eb = np.nonzero(np.triu(totals, 1))
+    strength = np.array([s for _, s in G.degree(weight='weight')], dtype=np.float64)
+    meta = {
+        'labels': labels,
+        'node_community': node_community,
+        'members': np.bincount(node_community, minlength=C),
+        'strength': np.bincount(node_community, weights=strength, minlength=C),
+        'intra': np.diag(totals).copy(),
+        'edges': (ea, eb, totals[ea, eb]),
+    }
+    if all('pos' in G.nodes[n] for n in names):
+        pos = np.array([G.nodes[n]['pos'] for n in names], dtype=np.float64).reshape(-1, 2)
+        meta['centroid'] = np.stack([np.bincount(node_community, weights=pos[:, d], minlength=C) for d in (0, 1)], axis=1) \
+            / np.maximum(meta['members'], 1)[:, None]
+    return meta
+
+def community_payload(G: nx.Graph, meta: dict, **style) -> dict:
+    """:func:`network_payload` plus supernode rows ``m``, inter-community edges ``me`` and each
+    node's community index ``k``. Supernodes keep the community palette."""
+    payload = network_payload(G, **style)
+    payload['mc'] = PALETTE
+    rows = []
+    for c, label in enumerate(meta['labels']):
+        row = [f"Community {label}", round(10 + 3 * float(np.log1p(meta['strength'][c])), 2), c % len(PALETTE),
+               int(meta['members'][c]), round(float(meta['intra'][c]), 2)]
+        if 'centroid' in meta:
+            row += [round(float(x), 1) for x in meta['centroid'][c]]
+        rows.append(row)
+    ea, eb, ew = meta['edges']
+    payload['m'] = rows
+    payload['me'] = [[int(x), int(y), round(float(z), 2)] for x, y, z in zip(ea, eb, ew)]
+    payload['k'] = meta['node_community'].tolist()
+    return payload
+
+def make_network_html(G: nx.Graph, physics: bool = False, height: int = 750, **style) -> str:
+    """Interactive vis.js HTML at the precomputed node positions, from the cached template.
+
+    With ``physics`` the browser runs Barnes-Hut from those positions and shows its settings panel.
+    ``style`` is passed to :func:`network_payload`.
+    """
+    payload = json.dumps(network_payload(G, **style), separators=(',', ':')).replace('</', '<\\/')
+    options = json.dumps(PHYSICS_OPTIONS if physics else STATIC_OPTIONS, separators=(',', ':'))
+    return NETWORK_TEMPLATE.substitute(payload=payload, options=options, height=height)
+
+def make_community_html(G: nx.Graph, meta: dict = None, physics: bool = False, height: int = 750, **style) -> str:
+    """Level-of-detail view: one node per community, expandable in the browser by clicking it."""
+    meta = community_meta_graph(G) if meta is None else meta
+    payload = json.dumps(community_payload(G, meta, **style), separators=(',', ':')).replace('</', '<\\/')
+    options = json.dumps(PHYSICS_OPTIONS if physics else STATIC_OPTIONS, separators=(',', ':'))
+    return COMMUNITY_TEMPLATE.substitute(payload=payload, options=options, height=height)
 
 def get_sci_network_visual():
-    st.title("Sparse‑View SCI Network with Live Physics")
+    st.title("Sparse‑View SCI Network with Precomputed Layout")
 
     st.markdown("""
     ## Network Visualization with Louvain, K-Core, and Top-K Algorithms
@@ -144,14 +533,50 @@ def get_sci_network_visual():
     """)
 
     data_path = os.path.join('data','Country_Names_SCI.csv')
-    df = load_and_preprocess(data_path)
 
-    top_k    = st.slider("Keep Top‑K edges per node", 1, 20, 5)
+    top_k    = st.slider("Keep Top‑K edges per node", 1, MAX_TOP_K, 5)
 
-    G_full   = build_full_graph(df)
-    G_sparse = top_k_subgraph(G_full, top_k)
+    resolution = st.select_slider("Louvain community resolution",
+                                  options=RESOLUTIONS, value=1.0)
+    with st.expander("Compare community resolutions"):
+        seeds = st.number_input("Louvain runs (seeds) per resolution", value=3, min_value=1, max_value=20, step=1)
+        if st.button("Run resolution scan"):
+            with st.spinner(f"Running Louvain at {len(RESOLUTIONS) * seeds} settings..."):
+                network = load_sci_network(data_path)
+                G_top = top_k_subgraph(network['G'], top_k, network['index'])
+                scan = louvain_resolution_scan(G_top, RESOLUTIONS, range(LOUVAIN_SEED, LOUVAIN_SEED + seeds))
+            st.dataframe(scan.sort_values(['resolution', 'seed']), use_container_width=True, hide_index=True)
 
-    G_comm = detect_and_layout(G_sparse)
-    html   = make_pyvis_html(G_comm)
+    G_comm = sparse_view(data_path, top_k, resolution)
+    n_nodes = G_comm.number_of_nodes()
+    style_col1, style_col2, style_col3 = st.columns(3)
+    with style_col1:
+        size_by = st.selectbox("Size nodes by", CENTRALITY_METRICS)
+    with style_col2:
+        color_by = st.selectbox("Colour nodes by", ('community',) + CENTRALITY_METRICS)
+    with style_col3:
+        pivots = st.number_input("Betweenness pivots (more is slower; all countries is exact)",
+                                 value=min(64, n_nodes), min_value=1, max_value=n_nodes, step=1)
+    metrics = load_centrality(G_comm, pivots, G_comm.graph['fingerprint'])
+    style  = {'metrics': metrics, 'size_by': size_by, 'color_by': color_by}
+    cores  = nx.get_node_attributes(G_comm, 'core')
+    core_k = st.slider("Core threshold (minimum weighted core value)", 0.0, float(max(cores.values())), 0.0)
+    if core_k > 0:
+        G_comm = weighted_k_core(G_comm, core_k, cores)
+    physics = st.toggle("Live physics (browser-side simulation; slower on large graphs)", value=False)
+    collapse = st.toggle("Collapse communities (click a community to expand it, double-click a country to collapse)",
+                         value=G_comm.number_of_nodes() > LOD_NODE_LIMIT)
+    if collapse:
+        # The cached aggregate only describes the unfiltered partition.
+        meta   = G_comm.graph['meta'] if core_k == 0 else community_meta_graph(G_comm)
+        html   = make_community_html(G_comm, meta, physics, **style)
+    else:
+        html   = make_network_html(G_comm, physics, **style)
 
     st.components.v1.html(html, height=800, scrolling=True)
+
+    st.markdown("#### Country Centrality")
+    st.markdown("""
+    Weighted PageRank, eigenvector centrality (within each connected component, 1 = its most central country), betweenness (shortest paths with 1 / SCI as distance, estimated from the sampled pivot countries) and weighted clustering for the current Top‑K network. Click a column header to sort.
+    """)
+    st.dataframe(metrics.sort_values('pagerank', ascending=False), use_container_width=True, hide_index=True)
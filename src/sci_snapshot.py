@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+SNAPSHOT_DIR = os.path.join('data', 'sci_snapshots')
+MANIFEST = 'manifest.json'
+SOURCE_CSV = os.path.join('data', 'Country_Names_SCI.csv')
+SHEET_URL = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vRid61-SbR59I_PjTO3VRYlIWcibSGbe71jVa8EVthBii4uiJS-NvziYfZlyD5BbwV2lPvMRv0Xy8sR/pub?gid=284046834&output=csv'
+
+
+def _read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    path = os.path.join(snapshot_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def _pack(df: pd.DataFrame):
+    """Country-level SCI table as integer-coded arrays plus a content hash."""
+    df = df.dropna(subset=['user_loc', 'fr_loc', 'scaled_sci'])
+    if 'log_sci' not in df.columns:
+        df = df.assign(log_sci=np.log1p(df['scaled_sci']))
+    countries = pd.unique(pd.concat([df['user_loc'], df['fr_loc']], ignore_index=True)).astype(str)
+    index = {c: i for i, c in enumerate(countries)}
+    arrays = {
+        'countries': countries.astype('U'),
+        'user_loc': df['user_loc'].map(index).to_numpy(dtype=np.int32),
+        'fr_loc': df['fr_loc'].map(index).to_numpy(dtype=np.int32),
+        'scaled_sci': df['scaled_sci'].to_numpy(dtype=np.float64),
+        'log_sci': df['log_sci'].to_numpy(dtype=np.float64),
+    }
+    digest = hashlib.sha256()
+    for key in sorted(arrays):
+        digest.update(key.encode())
+        digest.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return arrays, digest.hexdigest()
+
+
+def _unpack(arrays) -> pd.DataFrame:
+    countries = arrays['countries'].astype(object)
+    return pd.DataFrame({
+        'user_loc': countries[arrays['user_loc']],
+        'fr_loc': countries[arrays['fr_loc']],
+        'scaled_sci': arrays['scaled_sci'],
+        'log_sci': arrays['log_sci'],
+    })
+
+
+def write_snapshot(df: pd.DataFrame, source: str, snapshot_dir=SNAPSHOT_DIR) -> dict:
+    """Store ``df`` as the next snapshot version, or return the existing entry if the content is unchanged."""
+    arrays, sha = _pack(df)
+    manifest = _read_manifest(snapshot_dir)
+    for entry in manifest:
+        if entry['sha256'] == sha:
+            return entry
+    version = max((entry['version'] for entry in manifest), default=0) + 1
+    entry = {
+        'version': version,
+        'sha256': sha,
+        'file': f"sci_v{version:03d}_{sha[:12]}.npz",
+        'source': source,
+        'rows': int(len(arrays['user_loc'])),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    os.makedirs(snapshot_dir, exist_ok=True)
+    np.savez_compressed(os.path.join(snapshot_dir, entry['file']), **arrays)
+    manifest.append(entry)
+    with open(os.path.join(snapshot_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return entry
+
+
+@st.cache_resource(show_spinner=False)
+def load_sci_snapshot(version=None, snapshot_dir=SNAPSHOT_DIR):
+    """Parse a snapshot once per process; the latest version unless ``version`` is given.
+
+    Falls back to building version 1 from the bundled CSV, so the app never needs the network.
+    """
+    manifest = _read_manifest(snapshot_dir)
+    if not manifest:
+        manifest = [write_snapshot(pd.read_csv(SOURCE_CSV), SOURCE_CSV, snapshot_dir)]
+    if version is None:
+        entry = max(manifest, key=lambda e: e['version'])
+    else:
+        matches = [e for e in manifest if e['version'] == version]
+        if not matches:
+            raise ValueError(f"SCI snapshot version {version} not found in {snapshot_dir}")
+        entry = matches[0]
+    with np.load(os.path.join(snapshot_dir, entry['file'])) as arrays:
+        df = _unpack(arrays)
+    return df, entry
+
+
+def refresh_sci_snapshot(url=SHEET_URL, snapshot_dir=SNAPSHOT_DIR) -> dict:
+    """Opt-in remote refresh: fetch the published sheet and record it as a new snapshot version."""
+    entry = write_snapshot(pd.read_csv(url), url, snapshot_dir)
+    load_sci_snapshot.clear()
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned SCI snapshots for the message-passing simulator.")
+    parser.add_argument('--refresh', action='store_true', help="fetch the published Google Sheet into a new version")
+    parser.add_argument('--from-csv', help="record a local CSV export as a new version")
+    args = parser.parse_args()
+
+    if args.refresh:
+        entry = refresh_sci_snapshot()
+    elif args.from_csv:
+        entry = write_snapshot(pd.read_csv(args.from_csv), args.from_csv)
+    else:
+        entry = load_sci_snapshot()[1]
+    print(json.dumps(entry, indent=2))
@@ -4,6 +4,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import os
+from src.trade_matrices import trade_totals, pair_matrix
 
 @st.cache_data
 def load_country_names():
@@ -32,6 +33,22 @@ def rename_matrix_indices(matrix):
     matrix_copy = matrix_copy.rename(index=index_mapping, columns=column_mapping)
     return matrix_copy
 
+@st.cache_data
+def load_full_matrices():
+    """Full trade and SCI matrices written by preprocess_data.py, rows and columns in total-trade order.
+
+    Any top-N view is the leading ``iloc[:n, :n]`` block. Returns None if the files are missing.
+    """
+    try:
+        trade_matrix = pd.read_csv(os.path.join('data', 'trade_matrix_full.csv'), index_col=0)
+        sci_matrix = pd.read_csv(os.path.join('data', 'sci_matrix_full.csv'), index_col=0)
+    except FileNotFoundError:
+        return None
+    for matrix in (trade_matrix, sci_matrix):
+        matrix.index = matrix.index.astype(str)
+        matrix.columns = matrix.columns.astype(str)
+    return trade_matrix, sci_matrix
+
 @st.cache_data
 def load_and_prepare_heatmap_data(trade_sci_df, top_n=50):
     if not isinstance(trade_sci_df, pd.DataFrame) or trade_sci_df.empty:
@@ -43,32 +60,14 @@ def load_and_prepare_heatmap_data(trade_sci_df, top_n=50):
         st.error(f"Heatmap data is missing required columns: {required_cols}")
         return None
 
-    try:
-        trade_matrix = pd.read_csv(os.path.join('data', 'trade_matrix_top50.csv'), index_col=0)
-        sci_matrix = pd.read_csv(os.path.join('data', 'sci_matrix_top50.csv'), index_col=0)
-
-        if top_n == 50 and not trade_matrix.empty and not sci_matrix.empty:
-             trade_matrix.index = trade_matrix.index.astype(str)
-             trade_matrix.columns = trade_matrix.columns.astype(str)
-             sci_matrix.index = sci_matrix.index.astype(str)
-             sci_matrix.columns = sci_matrix.columns.astype(str)
-        else:
-             raise FileNotFoundError
-
-    except FileNotFoundError:
-        country_trade_totals = trade_sci_df.groupby('source')['trade_volume'].sum()
-        top_countries_series = country_trade_totals.nlargest(top_n)
-        top_country_codes = top_countries_series.index.astype(str).tolist()
-
-        trade_matrix = pd.DataFrame(0.0, index=top_country_codes, columns=top_country_codes, dtype='float64')
-        sci_matrix = pd.DataFrame(0.0, index=top_country_codes, columns=top_country_codes, dtype='float64')
-
-        for _, row in trade_sci_df.iterrows():
-            source = str(row['source'])
-            target = str(row['target'])
-            if source in top_country_codes and target in top_country_codes:
-                trade_matrix.at[source, target] = float(row['trade_volume'])
-                sci_matrix.at[source, target] = float(row['sci'])
+    full = load_full_matrices()
+    if full is None:
+        codes = trade_totals(trade_sci_df, value='trade_volume').index.astype(str).tolist()
+        pairs = trade_sci_df.assign(source=trade_sci_df['source'].astype(str), target=trade_sci_df['target'].astype(str))
+        full = (pair_matrix(pairs, 'source', 'target', 'trade_volume', codes),
+                pair_matrix(pairs, 'source', 'target', 'sci', codes))
+    trade_matrix = full[0].iloc[:top_n, :top_n].copy()
+    sci_matrix = full[1].iloc[:top_n, :top_n].copy()
 
     if trade_matrix.empty or sci_matrix.empty:
         st.warning("Could not create valid trade/SCI matrices.")
@@ -126,7 +125,10 @@ def display_trade_sci_heatmap(trade_sci_df):
         st.warning("No data available for heatmap visualization.")
         return
 
-    top_n = 50
+    full = load_full_matrices()
+    n_countries = len(full[0]) if full is not None else trade_sci_df['source'].nunique()
+    top_n = st.slider("Countries (by total trade)", min_value=min(10, n_countries), max_value=n_countries,
+                      value=min(50, n_countries), key="heatmap_top_n")
     heatmap_data = load_and_prepare_heatmap_data(trade_sci_df, top_n)
 
     if heatmap_data is None:
@@ -141,10 +143,10 @@ def display_trade_sci_heatmap(trade_sci_df):
         st.warning("Could not display correlation heatmap.")
         return
 
-    st.write("""
+    st.write(f"""
 **Visualization Explanation:**
 
-This heatmap visualizes the relationship between international trade volume and the Social Connectedness Index (SCI) for the top 50 countries, ranked by total trade volume. It displays a correlation score for each country pair, indicating how strongly their trade and social connections align. To calculate this score, both trade volume and SCI values are first adjusted using a log transformation to better handle large variations in the data. These adjusted values are then normalized to a standard 0-1 scale. The final score represents the combined strength of these normalized trade and social ties for each country pair, calculated using a geometric mean. A higher score signifies that both trade and SCI are relatively strong for that pair compared to others.
+This heatmap visualizes the relationship between international trade volume and the Social Connectedness Index (SCI) for the top {top_n} countries, ranked by total trade volume. It displays a correlation score for each country pair, indicating how strongly their trade and social connections align. To calculate this score, both trade volume and SCI values are first adjusted using a log transformation to better handle large variations in the data. These adjusted values are then normalized to a standard 0-1 scale. The final score represents the combined strength of these normalized trade and social ties for each country pair, calculated using a geometric mean. A higher score signifies that both trade and SCI are relatively strong for that pair compared to others.
 
 The Y-axis shows the source country (exporter or origin of social connection), and the X-axis shows the target country (importer or destination). The color intensity indicates the correlation score: brighter colors (like yellow) signify a higher correlation, meaning pairs where both normalized trade and SCI tend to be strong relative to other pairs. Darker colors (like purple or blue) indicate a lower score, where at least one of the metrics is weak. You can hover over any cell to see the specific countries and their correlation score. This visualization helps identify where economic ties (trade) and social ties (SCI) align. High correlation (bright cells) often suggests well-established, multifaceted relationships where strong trade and strong social connections go hand-in-hand. Low correlation (dark cells) might highlight interesting cases: strong trade despite weak social ties could indicate trade driven by other factors, while strong social ties with weak trade could point to untapped potential for economic partnership development. It allows for a deeper understanding of how social networks and international trade patterns interact.
 """)
@@ -160,7 +162,7 @@ The Y-axis shows the source country (exporter or origin of social connection), a
 
         fig.update_layout(
             title=title,
-            height=1000,
+            height=max(1000, 12 * len(matrix)),
             xaxis=dict(title="Target Country"),
             yaxis=dict(title="Source Country", autorange='reversed')
         )
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+
+def trade_totals(trade_df, source='source', target='target', value='value'):
+    """Total exports per country, for every country seen as exporter or importer, largest first.
+
+    Countries start in order of first appearance (exporter before importer within a row) and
+    totals are accumulated row by row, so ties and float sums match a plain Python loop.
+    The sort is stable.
+    """
+    codes = pd.unique(np.column_stack([trade_df[source], trade_df[target]]).ravel())
+    codes = codes[pd.notna(codes)]
+    position = pd.Series(np.arange(len(codes)), index=codes)
+    known = trade_df[source].isin(position.index)
+    totals = np.zeros(len(codes))
+    np.add.at(totals, position[trade_df.loc[known, source]].to_numpy(),
+              trade_df.loc[known, value].to_numpy(dtype=np.float64))
+    order = np.argsort(-totals, kind='stable')
+    return pd.Series(totals[order], index=codes[order])
+
+
+def pair_matrix(df, row, col, value, codes):
+    """Dense ``codes`` x ``codes`` matrix of ``value`` by integer index scatter.
+
+    Pairs outside ``codes`` are ignored, missing pairs are 0 and a repeated pair keeps its
+    last value.
+    """
+    position = pd.Series(np.arange(len(codes)), index=pd.Index(codes))
+    pairs = df[df[row].isin(position.index) & df[col].isin(position.index)]
+    pairs = pairs.drop_duplicates([row, col], keep='last')
+    matrix = np.zeros((len(codes), len(codes)))
+    matrix[position[pairs[row]].to_numpy(), position[pairs[col]].to_numpy()] = pairs[value].to_numpy(dtype=np.float64)
+    return pd.DataFrame(matrix, index=list(codes), columns=list(codes))
@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 import numpy as np
 import os
 from scipy import stats
+from src.trade_sci_join import join_trade_sci
 
 @st.cache_data
 def load_country_names():
@@ -86,33 +87,16 @@ def load_trade_sci_data():
 
 @st.cache_data
 def prepare_scatter_data(trade_df, sci_df):
-    merged_data = []
-    
-    for _, trade_row in trade_df.iterrows():
-        source = trade_row['source']
-        target = trade_row['target']
-        trade_value = trade_row['value']
-        
-        source_upper = str(source).upper()
-        target_upper = str(target).upper()
-        
-        sci_row = sci_df[((sci_df['user_loc'].str.upper() == source_upper) & (sci_df['fr_loc'].str.upper() == target_upper)) |
-                          ((sci_df['user_loc'].str.upper() == target_upper) & (sci_df['fr_loc'].str.upper() == source_upper))]
-        
-        if not sci_row.empty:
-            sci_value = sci_row['log_sci'].mean()
-            scaled_sci_value = sci_row['scaled_sci'].mean()
-            merged_data.append({
-                'country_pair': f"{source}-{target}",
-                'source': source,
-                'target': target,
-                'trade_volume': trade_value,
-                'log_trade_volume': np.log1p(trade_value),
-                'sci': scaled_sci_value,
-                'log_sci': sci_value
-            })
-    
-    return pd.DataFrame(merged_data)
+    joined = join_trade_sci(trade_df, sci_df, upper=True)
+    return pd.DataFrame({
+        'country_pair': joined['source'].astype(str) + "-" + joined['target'].astype(str),
+        'source': joined['source'],
+        'target': joined['target'],
+        'trade_volume': joined['value'],
+        'log_trade_volume': np.log1p(joined['value']),
+        'sci': joined['sci'],
+        'log_sci': joined['log_sci']
+    })
 
 def compute_regression(df, x_col, y_col):
     mask = ~df[x_col].isna() & ~df[y_col].isna()
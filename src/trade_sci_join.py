@@ -0,0 +1,40 @@
+import pandas as pd
+
+
+def sci_pair_means(sci_df, upper=False):
+    """Mean ``scaled_sci`` and ``log_sci`` per unordered country pair, over both directions.
+
+    Each row's (user_loc, fr_loc) is canonicalized as (min, max) so both directions fall into
+    one group. Rows with a missing code are dropped, since they never match a trade pair.
+    """
+    user, friend = sci_df['user_loc'], sci_df['fr_loc']
+    if upper:
+        user, friend = user.str.upper(), friend.str.upper()
+    known = user.notna() & friend.notna()
+    user, friend = user[known], friend[known]
+    swap = user > friend
+    pairs = pd.DataFrame({
+        'pair_lo': user.where(~swap, friend),
+        'pair_hi': friend.where(~swap, user),
+        'sci': sci_df.loc[known, 'scaled_sci'],
+        'log_sci': sci_df.loc[known, 'log_sci'],
+    })
+    return pairs.groupby(['pair_lo', 'pair_hi'], sort=False)[['sci', 'log_sci']].mean().reset_index()
+
+
+def join_trade_sci(trade_df, sci_df, upper=False):
+    """Trade rows (in their original order) that have SCI for their pair, with the pair's mean SCI.
+
+    Equivalent to filtering ``sci_df`` on both directions of every trade row and averaging,
+    but done as one group-by and one merge. ``upper`` compares codes case-insensitively.
+    Adds ``sci`` (mean scaled SCI) and ``log_sci`` columns to the trade columns.
+    """
+    source, target = trade_df['source'], trade_df['target']
+    if upper:
+        source, target = source.astype(str).str.upper(), target.astype(str).str.upper()
+    known = source.notna() & target.notna()
+    source, target = source[known], target[known]
+    swap = source > target
+    keyed = trade_df[known].assign(pair_lo=source.where(~swap, target), pair_hi=target.where(~swap, source))
+    joined = keyed.merge(sci_pair_means(sci_df, upper), on=['pair_lo', 'pair_hi'], how='inner')
+    return joined.drop(columns=['pair_lo', 'pair_hi'])
@@ -1,10 +1,16 @@
 import pandas as pd
 import time
+import uuid
 import random
 import streamlit as st
 import tableauserverclient as TSC
 import streamlit.components.v1 as components
-from src.mpi import MessagePassing, mpi_get_data, mpi_select_status, mpi_run_fig, mpi_select_fig
+from src.mpi import MessagePassing, mpi_select_status, mpi_run_fig, mpi_select_fig
+from src.mpi_jobs import get_job_manager
+from src.mpi_store import get_result_store
+from src.mpi_models import MODELS
+from src.mpi_sweep import display_critical_sweep
+from src.mpi_influence import display_influence_ranking
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
@@ -63,13 +69,43 @@ By experimenting with these settings, you can explore scenarios where informatio
 delta_t = 50
 at = 100
 
-mpi_col1, mpi_col2, mpi_col3 = st.columns(3)
+model_col1, model_col2 = st.columns([3, 1])
+with model_col1:
+    model = st.selectbox(
+        label="Diffusion Model",
+        options=list(MODELS),
+        format_func=lambda name: MODELS[name].label
+    )
+with model_col2:
+    recovery = st.number_input(label="Recovery Probability",value=0.1,min_value=0.0,max_value=1.0,step=0.01,format="%.2f",disabled=model not in ('sir', 'sis'))
+
+sim_mode = st.radio(
+    label="Simulation Mode",
+    options=["Expected (instant preview)", "Stochastic"],
+    horizontal=True,
+    disabled=model != 'threshold'
+)
+expected_mode = sim_mode.startswith("Expected") and model == 'threshold'
+
+mpi_col1, mpi_col2, mpi_col3, mpi_col4 = st.columns(4)
 with mpi_col1:
     pp = st.number_input(label="Passing Probability",value=1.0,min_value=0.0,max_value=1.0,step=0.01,format="%.2f")
 with mpi_col2:
     ts = st.number_input(label="Enter Timesteps", value=256, min_value=5,max_value=1000,step=1, )
 with mpi_col3:
     at = st.number_input(label="Enter Activation Threshold",value=100,min_value=1,max_value=1000,step=1,)
+with mpi_col4:
+    replicates = st.number_input(label="Monte Carlo Replicates",value=1,min_value=1,max_value=500,step=1,disabled=expected_mode)
+
+stop_col1, stop_col2, stop_col3 = st.columns(3)
+stop_disabled = expected_mode or model != 'threshold'
+with stop_col1:
+    stop_early = st.checkbox("Stop once the cascade settles", value=True, disabled=stop_disabled)
+with stop_col2:
+    quiet_stop = st.checkbox("Also stop after a quiet window (approximate)", value=False, disabled=stop_disabled or not stop_early,
+                             help="Stops after this many steps without a new hit even though countries can still be reached, so it can truncate cascades that are still live.")
+with stop_col3:
+    window = st.number_input(label="Quiet Window (steps without change)",value=20,min_value=1,max_value=1000,step=1,disabled=stop_disabled or not (stop_early and quiet_stop))
 
 projection_ops = ['orthographic', 'equirectangular', 'natural earth', 'conic equidistant', 'stereographic']
 projection_choice = st.selectbox(
@@ -79,14 +115,34 @@ projection_choice = st.selectbox(
 
 if "mpi_event" not in st.session_state:
     st.session_state.mpi_event = None
+if "mpi_session" not in st.session_state:
+    st.session_state.mpi_session = uuid.uuid4().hex
 mpi_placeholder = st.empty()
 
 if  st.session_state.mpi_event is not None and len(st.session_state.mpi_event['selection']['points']) > 0:
     country =st.session_state.mpi_event['selection']['points'][0]['location']
     st.write("Selected country:", country)
-    df = mpi_get_data(country, at=at, ts=ts, pp=pp)
-    fig = mpi_run_fig(df, at, delta_t, projection_choice)
+    job = get_job_manager().submit(st.session_state.mpi_session, country=country, at=at, ts=ts, pp=pp,
+                                   replicates=replicates, engine='frontier' if stop_early else 'vectorized',
+                                   window=window if stop_early and quiet_stop else None,
+                                   mode='expected' if expected_mode else 'stochastic',
+                                   model=model, recovery=recovery)
+    # Any widget change interrupts this wait; the rerun submits new parameters and the
+    # superseded job is cancelled unless another session still wants it.
+    progress_bar = st.progress(0.0)
+    while not job.done():
+        progress_bar.progress(job.fraction, text=f"Simulating step {job.done_steps} of {job.total_steps}...")
+        time.sleep(0.2)
+    progress_bar.empty()
+    result = job.result()
+    if result['converged_at'] is not None:
+        st.write(f"Converged at step {result['converged_at']} of {ts}; later frames repeat the settled state.")
+    fig = mpi_run_fig(result, at if model == 'threshold' else 100, delta_t, projection_choice)
     mpi_placeholder.plotly_chart(fig, use_container_width=True, key="mpi_mode")
+    store = get_result_store().stats()
+    st.caption(f"Result store: {store['hits']} hits, {store['misses']} misses, "
+               f"{store['entries']} runs ({store['bytes'] / 2**20:.1f} of {store['max_bytes'] / 2**20:.0f} MB)")
+    display_critical_sweep(country, ts, at)
 else:
     mpi = MessagePassing()
     fig = mpi_select_fig(mpi.countries_input, projection_choice)
@@ -97,8 +153,12 @@ else:
 
 if st.button('Reset'):
     st.session_state.mpi_event = None
+    get_job_manager().forget(st.session_state.mpi_session)
     st.rerun()
 
+if st.checkbox("Rank all starting countries by influence"):
+    display_influence_ranking(ts, pp, at, projection_choice)
+
 
 st.markdown("""
 ### Why is this important?
@@ -121,6 +181,12 @@ st.markdown("""
 Use the sidebar controls to tweak these settings before or during the simulation:
 
 
+- **Diffusion Model**
+  *Repeated Exposure* is the original rule: informed countries keep passing until a country has received enough passes. *Independent Cascade* gives each newly informed country one chance per neighbor. *Linear Threshold* informs a country once the SCI-weighted share of informed neighbors exceeds a random threshold. *SIR* and *SIS* let infected countries recover with the **Recovery Probability** each step; under SIR recovered countries (shown at half intensity) stay immune, under SIS they can be reinfected.
+
+- **Simulation Mode**
+  *Expected* computes the average cascade deterministically in milliseconds, which is handy for exploring parameters. *Stochastic* draws one random realization (or several, with replicates).
+
 - **Passing Probability**  
   Chance that an informed node successfully passes the message to each neighbor per iteration.
 
@@ -129,6 +195,9 @@ Use the sidebar controls to tweak these settings before or during the simulation
 
 - **Number of Iterations**  
   How many discrete time steps the simulation will run. You can pause, advance step-by-step, or animate continuously.
+
+- **Monte Carlo Replicates**  
+  How many independent runs to average. With more than one, the map shows the mean activation and hovering shows the median and 5th–95th percentile band.
 """)
 
 st.markdown("""